@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import logging
+import random
+import uuid
+from datetime import date, timedelta
+
+import dotenv
+
+from pkg.database import (
+    Database,
+    get_database_url,
+    insert_requirements_and_items,
+    reconcile_stats,
+)
+from pkg.queries import QUERIES
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+# Parameter values used for every registered query, picked from the seeded
+# rows so the planner sees realistic selectivity.
+SAMPLES = {
+    "email": "SELECT Email FROM Volunteer ORDER BY ID LIMIT 1",
+    "recipient_id": "SELECT ID FROM Recipient ORDER BY ID LIMIT 1",
+    "requirement_id": "SELECT ID FROM Requirement ORDER BY ID LIMIT 1",
+    "owner": "SELECT ID FROM Volunteer ORDER BY ID LIMIT 1",
+}
+SAMPLE_LISTS = {
+    "requirement_ids": "SELECT ID FROM Requirement ORDER BY ID LIMIT 20",
+    "keys": "SELECT ID FROM Volunteer ORDER BY ID LIMIT 20",
+}
+CONSTANTS = {
+    "search_line": "%a%",
+    "role": "Volunteer",
+    "limit": 20,
+    "offset": 0,
+    "top": 20,
+    "terms": '"a"',
+}
+
+
+async def seed(db: Database, requirements: int):
+    users = max(requirements // 10, 1)
+    recipients = [str(uuid.uuid4()) for _ in range(users)]
+    volunteers = [str(uuid.uuid4()) for _ in range(users)]
+    funds = [str(uuid.uuid4()) for _ in range(users)]
+    await db.execute_many(
+        "INSERT INTO Recipient (ID, Name, Email) VALUES (:id, :name, :email)",
+        [
+            {"id": id, "name": f"recipient {i}", "email": f"recipient{i}@example.com"}
+            for i, id in enumerate(recipients)
+        ],
+    )
+    await db.execute_many(
+        "INSERT INTO Volunteer (ID, Name, Email) VALUES (:id, :name, :email)",
+        [
+            {"id": id, "name": f"volunteer {i}", "email": f"volunteer{i}@example.com"}
+            for i, id in enumerate(volunteers)
+        ],
+    )
+    await db.execute_many(
+        "INSERT INTO Fund (ID, Name, Status, Volunteer) VALUES (:id, :name, 'Active', :volunteer)",
+        [
+            {"id": id, "name": f"fund {i}", "volunteer": volunteers[i]}
+            for i, id in enumerate(funds)
+        ],
+    )
+    rows, items = [], []
+    for i in range(requirements):
+        requirement_id = str(uuid.uuid4())
+        rows.append(
+            {
+                "id": requirement_id,
+                "deadline": date.today() + timedelta(days=random.randint(-30, 90)),
+                "name": f"requirement {i}",
+                "priority": random.choice(["Default", "High", None]),
+                "fund": random.choice(funds + [None] * 9),
+                "description": None,
+                "recipient": random.choice(recipients),
+            }
+        )
+        for j in range(3):
+            items.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "name": f"item {i}.{j}",
+                    "count": random.randint(1, 50),
+                    "requirement_id": requirement_id,
+                    "category": random.choice(["Food", "Medicine", "Other"]),
+                }
+            )
+    await insert_requirements_and_items(db, rows, items)
+    await db.execute_many(
+        "INSERT INTO ItemReservation (Item, Fund, Quantity) VALUES (:item, :fund, 1)",
+        [
+            {"item": item["id"], "fund": random.choice(funds)}
+            for item in random.sample(items, len(items) // 5)
+        ],
+    )
+    await db.connection.execute(
+        "UPDATE Item SET Remaining = Remaining - 1 WHERE ID IN (SELECT Item FROM ItemReservation)"
+    )
+    await reconcile_stats(db)
+    await db.connection.execute("ANALYZE")
+
+
+async def sample_values(db: Database) -> dict:
+    values = dict(CONSTANTS)
+    for name, query in SAMPLES.items():
+        values[name] = await db.connection.fetch_val(query)
+    for name, query in SAMPLE_LISTS.items():
+        values[name] = [r["ID"] for r in await db.connection.fetch_all(query)]
+    return values
+
+
+async def main(args: argparse.Namespace):
+    dotenv.load_dotenv()
+    db = Database(get_database_url())
+    await db.connect()
+    await db.migrate()
+    try:
+        if args.seed:
+            logging.info("Seeding %d requirements", args.seed)
+            await seed(db, args.seed)
+        values = await sample_values(db)
+        report = []
+        for name, query in sorted(QUERIES.items()):
+            plan = await db.explain(
+                name, {param: values.get(param) for param in query.params}
+            )
+            report.append(f"== {name}\n" + "\n".join(plan) + "\n")
+    finally:
+        await db.disconnect()
+
+    text = "\n".join(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        logging.info("Wrote %d plans to %s", len(report), args.output)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Record the query plan of every registered query."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="insert this many synthetic requirements first",
+    )
+    parser.add_argument("--output", help="write the plans to this file")
+    asyncio.run(main(parser.parse_args()))
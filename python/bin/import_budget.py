@@ -0,0 +1,76 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+# Backends that must stay out of a freshly booted worker; they are loaded on
+# first use. The bcrypt package itself is not listed: PyJWT pulls it in
+# through cryptography's SSH key support.
+LAZY_MODULES = [
+    "asyncpg",
+    "numpy",
+    "scipy",
+    "passlib.context",
+    "passlib.handlers.bcrypt",
+    "pypdf",
+]
+
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(module: str) -> tuple[list[tuple[int, str]], int, set[str]]:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {module}; print('\\n'.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings, total = [], 0
+    for line in result.stderr.splitlines():
+        if not (match := IMPORT_TIME.match(line)):
+            continue
+        cumulative, indent, name = int(match[2]), len(match[3]), match[4]
+        timings.append((cumulative, name))
+        # Top-level imports are indented by one space only.
+        if indent == 1:
+            total += cumulative
+    return timings, total, set(result.stdout.split())
+
+
+def main(args: argparse.Namespace) -> int:
+    timings, total, loaded = measure(args.module)
+    total_ms = total / 1000
+
+    print(f"import {args.module}: {total_ms:.0f}ms (budget {args.budget:.0f}ms)")
+    for cumulative, name in sorted(timings, reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:8.1f}ms  {name}")
+
+    failed = False
+    if total_ms > args.budget:
+        print(f"Import time is over budget by {total_ms - args.budget:.0f}ms")
+        failed = True
+    if eager := [name for name in LAZY_MODULES if name in loaded]:
+        print(f"Imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that a worker imports within the startup budget."
+    )
+    parser.add_argument("--module", default="bin.server")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument(
+        "--top", type=int, default=15, help="list this many slowest imports"
+    )
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,28 @@
+import asyncio
+import logging
+
+import dotenv
+
+from pkg.dashboard import rebuild_dashboards
+from pkg.database import Database, get_database_url
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+
+async def main():
+    dotenv.load_dotenv()
+    db = Database(get_database_url())
+    await db.connect()
+    await db.migrate()
+    try:
+        rebuilt = await rebuild_dashboards(db)
+        logging.info("Rebuilt %d dashboards", rebuilt)
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
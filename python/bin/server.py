@@ -6,12 +6,40 @@ from pkg.api import (
     requirement_router,
     fund_router,
     profile_router,
+    export_router,
+    events_router,
+    stats_router,
+    health_router,
+    uploads_router,
+)
+from pkg.activity import ActivityBuffer
+from pkg.blobs import collect_blobs_forever
+from pkg.compaction import compact_forever
+from pkg.dashboard import DashboardProjector
+from pkg.database import Database, get_database_url
+from pkg.events import PostgresEventRelay
+from pkg.middleware import (
+    ActivityMiddleware,
+    PrintBodyMiddleware,
+    ReadYourWritesMiddleware,
+)
+from pkg.ratelimit import DatabaseBucketBackend, LoginRateLimitMiddleware
+from pkg.replicas import replica_urls
+from pkg.reports import ReportPipeline
+from pkg.sqlite import optimize_forever
+from pkg.stats import reconcile_stats_forever
+from pkg.warmup import warm_up_until_ready
+from pkg.workers import (
+    GRACEFUL_SHUTDOWN_SECONDS,
+    cpu_count,
+    max_workers,
+    worker_count,
+    worker_pool_size,
 )
-from pkg.database import Database, DatabasePg
-from pkg.middleware import PrintBodyMiddleware
 from contextlib import asynccontextmanager
 
 from pkg.utils import UPLOAD_PATH
+import asyncio
 import dotenv
 import os
 import logging
@@ -26,24 +54,54 @@ logging.basicConfig(
 async def lifespan(app: FastAPI):
     dotenv.load_dotenv()
     logging.info("Connecting to the database...")
-    pg_db = os.getenv("DATABASE_URL", None)
-    if pg_db:
-        db = DatabasePg(pg_db)
-    else:
-        logging.info("Using SQLite database")
-    db = Database("sqlite+aiosqlite:///database.db")
+    workers = worker_count()
+    db = Database(get_database_url(), replica_urls(), worker_pool_size(workers))
+    logging.info(
+        "Using %s database with %d read replicas", db.dialect, len(db.reader.replicas)
+    )
     await db.connect()
-    await db.create_tables()
+    if await db.migrate():
+        logging.info("Database schema updated")
+    db.events.add_listener(DashboardProjector(db))
     app.state.db = db
+    app.state.reports = ReportPipeline(db)
+    app.state.activity = ActivityBuffer(db)
+    app.state.ready = False
     logging.info("Database connected")
+    default_backend = "database" if workers > 1 else "memory"
+    if os.getenv("RATE_LIMIT_BACKEND", default_backend) == "database":
+        app.state.rate_limit_backend = DatabaseBucketBackend(db)
+        logging.info("Using shared database rate limit buckets")
+    # Warmup runs after startup so the liveness probe answers while the
+    # readiness probe keeps traffic away until it is done.
+    tasks = [
+        asyncio.create_task(warm_up_until_ready(app)),
+        asyncio.create_task(reconcile_stats_forever(db)),
+        asyncio.create_task(collect_blobs_forever(db)),
+        asyncio.create_task(compact_forever(db)),
+        asyncio.create_task(db.reader.monitor()),
+        asyncio.create_task(app.state.reports.run()),
+        asyncio.create_task(app.state.activity.run()),
+    ]
+    if db.dialect == "postgresql":
+        relay = PostgresEventRelay(db.events, get_database_url())
+        tasks.append(asyncio.create_task(relay.run()))
+    if db.dialect == "sqlite":
+        tasks.append(asyncio.create_task(optimize_forever(db.connection)))
     yield
+    for task in tasks:
+        task.cancel()
+    app.state.reports.close()
+    await app.state.activity.close()
     await db.disconnect()
     logging.info("Database disconnected")
 
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(PrintBodyMiddleware)
-app.mount("/api/uploads", StaticFiles(directory=UPLOAD_PATH), name="uploads")
+app.add_middleware(ActivityMiddleware)
+app.add_middleware(LoginRateLimitMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 app.include_router(
     profile_router,
     prefix="/api",
@@ -69,9 +127,70 @@ app.include_router(
     prefix="/api",
     tags=["fund"],
 )
+app.include_router(
+    export_router,
+    prefix="/api",
+    tags=["export"],
+)
+app.include_router(
+    events_router,
+    prefix="/api",
+    tags=["events"],
+)
+app.include_router(
+    stats_router,
+    prefix="/api",
+    tags=["stats"],
+)
+app.include_router(
+    health_router,
+    prefix="/api",
+    tags=["health"],
+)
+app.include_router(
+    uploads_router,
+    prefix="/api",
+    tags=["uploads"],
+)
+# Mounted after the routers so /api/uploads/blobs is not served as a plain
+# static file.
+app.mount("/api/uploads", StaticFiles(directory=UPLOAD_PATH), name="uploads")
+
+
+async def migrate():
+    db = Database(get_database_url())
+    await db.connect()
+    try:
+        if await db.migrate():
+            logging.info("Database schema updated")
+    finally:
+        await db.disconnect()
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, port=8000, host="0.0.0.0")
+    dotenv.load_dotenv()
+    workers = int(os.getenv("WEB_CONCURRENCY") or cpu_count())
+    if workers > 1 and not get_database_url().startswith("postgresql"):
+        # Events are only relayed between processes through Postgres, and
+        # SQLite serializes writers anyway.
+        logging.warning("SQLite runs with a single worker, not %d", workers)
+        workers = 1
+    if workers > max_workers():
+        logging.warning(
+            "DB_CONNECTION_BUDGET allows %d workers, not %d", max_workers(), workers
+        )
+        workers = max_workers()
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    # Migrate once here rather than racing the schema changes in every
+    # worker; the workers then find the schema up to date.
+    asyncio.run(migrate())
+    logging.info("Starting %d workers", workers)
+    uvicorn.run(
+        "bin.server:app",
+        port=8000,
+        host="0.0.0.0",
+        workers=workers,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+    )
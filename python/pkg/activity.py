@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import os
+import time
+
+from pkg.database import Database, record_user_activity
+
+ACTIVITY_FLUSH_SECONDS = float(os.getenv("ACTIVITY_FLUSH_SECONDS", 10))
+ACTIVITY_FLUSH_SIZE = int(os.getenv("ACTIVITY_FLUSH_SIZE", 500))
+
+
+class ActivityBuffer:
+    # Collects login and last-seen times in memory and writes them to
+    # UserActivity in one batch every ACTIVITY_FLUSH_SECONDS, or sooner once
+    # ACTIVITY_FLUSH_SIZE users are pending. Recording costs a dict update;
+    # a crash loses at most one interval of activity.
+    def __init__(self, db: Database):
+        self.db = db
+        # User ID -> (last login, last seen); a user is written once per
+        # batch however many requests they made.
+        self.pending: dict[str, tuple[float | None, float]] = {}
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def login(self, user_id: str):
+        now = time.time()
+        self.pending[user_id] = (now, now)
+        self._check_size()
+
+    def seen(self, user_id: str):
+        last_login, _ = self.pending.get(user_id, (None, 0))
+        self.pending[user_id] = (last_login, time.time())
+        self._check_size()
+
+    def _check_size(self):
+        if len(self.pending) >= ACTIVITY_FLUSH_SIZE:
+            self._full.set()
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), ACTIVITY_FLUSH_SECONDS)
+            except TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to write user activity")
+
+    async def flush(self):
+        async with self._lock:
+            batch, self.pending = self.pending, {}
+            if not batch:
+                return
+            try:
+                await record_user_activity(
+                    self.db,
+                    [
+                        {"user_id": user_id, "last_login": login, "last_seen": seen}
+                        for user_id, (login, seen) in batch.items()
+                    ],
+                )
+            except BaseException:
+                # Kept for the next flush; anything recorded since is newer.
+                for user_id, (login, seen) in batch.items():
+                    newer_login, newer_seen = self.pending.get(user_id, (None, 0))
+                    self.pending[user_id] = (
+                        newer_login or login,
+                        max(seen, newer_seen),
+                    )
+                raise
+
+    async def close(self):
+        try:
+            await self.flush()
+        except Exception:
+            logging.exception("Failed to write user activity on shutdown")
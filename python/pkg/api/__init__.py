@@ -3,6 +3,11 @@ from .recipient import recipient_router
 from .requirement import requirement_router
 from .volunteer import volunteer_router
 from .profile import profile_router
+from .export import export_router
+from .events import events_router
+from .stats import stats_router
+from .health import health_router
+from .uploads import uploads_router
 
 
 __all__ = [
@@ -11,6 +16,11 @@ __all__ = [
     "requirement_router",
     "volunteer_router",
     "profile_router",
+    "export_router",
+    "events_router",
+    "stats_router",
+    "health_router",
+    "uploads_router",
 ]
 
 # @router.get("/items")
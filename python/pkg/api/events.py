@@ -0,0 +1,65 @@
+import asyncio
+import json
+import os
+from typing import Annotated
+from fastapi import HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRouter
+
+from pkg.utils import decode_access_token
+
+from pkg.models import *
+from pkg.database import *
+
+
+events_router = APIRouter(prefix="/events")
+
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", 15))
+
+
+@events_router.get("/")
+async def stream_events_endpoint(
+    req: Request,
+    token: Annotated[str | None, Header()] = None,
+    access_token: str | None = None,
+) -> StreamingResponse:
+    # EventSource cannot send custom headers, so the token may also come in
+    # the query string.
+    token = token or access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Token is missing")
+    if not (email := decode_access_token(token).get("sub")):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    db = req.app.state.db
+    try:
+        user = await get_user(db, email)
+    except DatabaseException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    role = RoleEnum.volunteer if isinstance(user, Volunteer) else RoleEnum.recipient
+
+    async def stream():
+        subscription = db.events.subscribe(role, user.id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), EVENT_KEEPALIVE_SECONDS
+                    )
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                data = json.dumps(event.data, ensure_ascii=False, default=str)
+                yield f"event: {event.type}\ndata: {data}\n\n"
+        finally:
+            db.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Annotated, AsyncIterator
+from fastapi import HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRouter
+
+from pkg.utils import decode_access_token
+
+from pkg.database import *
+
+
+export_router = APIRouter(prefix="/export")
+
+EXPORT_CHUNK_ROWS = 500
+
+
+class ExportDataset(str, Enum):
+    funds = "funds"
+    requirements = "requirements"
+    reports = "reports"
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+async def stream_csv(db: Database, dataset: str) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(get_export_columns(dataset))
+    rows = 0
+    async for row in iterate_export_rows(db, dataset):
+        writer.writerow(row)
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def stream_ndjson(db: Database, dataset: str) -> AsyncIterator[str]:
+    columns = get_export_columns(dataset)
+    chunk = []
+    async for row in iterate_export_rows(db, dataset):
+        chunk.append(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str)
+        )
+        if len(chunk) == EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+@export_router.get("/{dataset}")
+async def export_dataset_endpoint(
+    token: Annotated[str | None, Header()],
+    req: Request,
+    dataset: ExportDataset,
+    format: ExportFormat = ExportFormat.csv,
+) -> StreamingResponse:
+    if not token:
+        raise HTTPException(status_code=401, detail="Token is missing")
+    if not (email := decode_access_token(token).get("sub")):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    db = req.app.state.db
+    # Exports cover every fund and requirement, so they are for volunteers.
+    identity = await get_user_identity(db, email)
+    if identity is None or identity["Role"] != RoleEnum.volunteer.value:
+        raise HTTPException(status_code=403, detail="Only volunteers can export data")
+    if format == ExportFormat.csv:
+        content, media_type = stream_csv(db, dataset.value), "text/csv"
+    else:
+        content, media_type = stream_ndjson(db, dataset.value), "application/x-ndjson"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{dataset.value}.{format.value}"'
+            )
+        },
+    )
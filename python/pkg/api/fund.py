@@ -1,12 +1,24 @@
 from typing import Annotated
-from uuid import uuid1
-from fastapi import File, HTTPException, Header, Request, UploadFile
+from fastapi import (
+    File,
+    HTTPException,
+    Header,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.routing import APIRouter
 
+from pkg.storage import image_content_type
 from pkg.utils import (
+    blob_url,
     decode_access_token,
-    save_file,
 )
+from pkg.loaders import get_loaders
+from pkg.records import FundRecord, record_fields
+from pkg.serialization import model_response
 
 from pkg.models import *
 from pkg.database import *
@@ -15,30 +27,51 @@ from pkg.database import *
 fund_router = APIRouter(prefix="/fund")
 
 
-@fund_router.get("/")
-async def search_funds_endpoint(req: Request, query: str = "") -> list[Fund]:
+@fund_router.get("/", response_model=list[Fund])
+async def search_funds_endpoint(req: Request, query: str = "") -> Response:
     db = req.app.state.db
     result = await get_funds(db, query)
-    return result
+    return model_response(list[FundRecord], result)
+
+
+@fund_router.get("/report/search")
+async def search_reports_endpoint(
+    req: Request, query: str, limit: Annotated[int, Query(ge=1, le=50)] = 20
+) -> list[ReportSearchResult]:
+    db = req.app.state.db
+    return await search_reports(db, query, limit)
 
 
 @fund_router.get("/{fund_id}")
 async def get_fund_by_id_endpoint(fund_id: str, req: Request) -> DetailFund:
     db = req.app.state.db
+    loaders = get_loaders(req)
 
     try:
-        fund = await get_fund_by_id(db, fund_id)
-        report = await get_report_by_fund(db, fund_id)
-        volunteer = await get_volunteer_by_fund(db, fund.id)
-        requirement = await get_requirement_by_fund(db, fund.id)
-        requirement.recipient = await get_recipient_by_requirement(db, requirement.id)
+        (
+            fund,
+            report_file,
+            report,
+            report_document,
+            volunteer,
+            requirement,
+        ) = await loaders.gather(
+            loaders.funds.load(fund_id),
+            get_fund_report_file(db, fund_id),
+            get_report_by_fund(db, fund_id),
+            get_report_document(db, fund_id),
+            loaders.volunteers_by_fund.load(fund_id),
+            loaders.fund_requirement(fund_id),
+        )
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
     return DetailFund(
-        **fund.model_dump(),
+        **record_fields(fund),
+        report_file=report_file,
         requirement=requirement,
         report=report,
+        report_document=report_document,
         volunteer=volunteer,
     )
 
@@ -57,14 +90,18 @@ async def upload_fund_photo_endpoint(
 
     if not (decode_access_token(token).get("sub")):
         raise HTTPException(status_code=401, detail="Invalid token")
-    filename = f"{uuid1()}.jpg"
-    save_file(fund_photo.file, filename)
+    content_type = await run_in_threadpool(image_content_type, fund_photo.file)
+    if content_type is None:
+        raise HTTPException(
+            status_code=415, detail="Expected a JPEG, PNG, WebP or GIF image"
+        )
+    digest, _ = await save_blob(db, fund_photo.file, content_type)
     try:
-        await update_fund_picture(db, fund_id, f"/uploads/{filename}")
+        await update_fund_picture(db, fund_id, blob_url(digest))
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    return {"profile_pic": f"/uploads/{filename}"}
+    return {"profile_pic": blob_url(digest)}
 
 
 @fund_router.post("/")
@@ -80,7 +117,8 @@ async def create_fund_endpoint(
         raise HTTPException(status_code=401, detail="Invalid token")
     try:
         fund_id = await create_fund(db, fund, volunteer_id)
-        await update_items_with_fund(db, fund.items, fund_id)
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
     return MessageWithId(
@@ -89,6 +127,35 @@ async def create_fund_endpoint(
     )
 
 
+@fund_router.post("/{fund_id}/items")
+async def reserve_items_endpoint(
+    token: Annotated[str | None, Header()],
+    req: Request,
+    fund_id: str,
+    reservations: list[ItemReservationCreate],
+) -> Message:
+    db = req.app.state.db
+    if not token:
+        raise HTTPException(status_code=401, detail="Token is missing")
+    if not (email := decode_access_token(token).get("sub")):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    try:
+        volunteer = await get_volunteer_by_fund(db, fund_id)
+    except DatabaseException:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    if volunteer.email != email:
+        raise HTTPException(
+            status_code=403, detail="Only the fund's volunteer can reserve items"
+        )
+    try:
+        await update_items_with_fund(db, [], fund_id, reservations)
+    except ReservationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DatabaseException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Message(message="Items reserved")
+
+
 @fund_router.put("/{fund_id}")
 async def update_fund_endpoint(
     token: Annotated[str | None, Header()],
@@ -135,15 +202,22 @@ async def add_fund_report_endpoint(
 @fund_router.post("/{fund_id}/report/pdf")
 async def upload_pdf_to_report(
     token: Annotated[str | None, Header()],
+    req: Request,
     fund_id: str,
     report_pdf: UploadFile = File(...),
 ) -> Message:
+    db = req.app.state.db
     if not token:
         raise HTTPException(status_code=401, detail="Token is missing")
     if not (decode_access_token(token).get("sub")):
         raise HTTPException(status_code=401, detail="Invalid token")
-    filename = f"{fund_id}.pdf"
-    save_file(report_pdf.file, filename)
+    digest, _ = await save_blob(db, report_pdf.file, "application/pdf")
+    try:
+        await update_fund_report_file(db, fund_id, blob_url(digest))
+    except DatabaseException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    await queue_report_document(db, fund_id, digest)
+    req.app.state.reports.wake()
     return Message(
-        message=f"Report PDF uploaded successfully: {filename}",
+        message=f"Report PDF uploaded successfully: {blob_url(digest)}",
     )
@@ -0,0 +1,21 @@
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRouter
+
+from pkg.models import Message
+
+
+health_router = APIRouter(prefix="/health")
+
+
+@health_router.get("/live")
+async def live_endpoint() -> Message:
+    return Message(message="Alive")
+
+
+@health_router.get("/ready")
+async def ready_endpoint(req: Request) -> Message:
+    # Flips once warmup has finished, so rolling deploys only send traffic
+    # to pods with warm pools, statements and serializers.
+    if not getattr(req.app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Warming up")
+    return Message(message="Ready")
@@ -1,9 +1,11 @@
 from typing import Annotated
 from fastapi import HTTPException, Header, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.routing import APIRouter
-from pkg.utils import save_file
 
+from pkg.storage import image_content_type
 from pkg.utils import (
+    blob_url,
     create_access_token,
     decode_access_token,
 )
@@ -33,6 +35,7 @@ async def login_endpoint(user_data: UserLogin, req: Request) -> LoginResponse:
     token = create_access_token(
         data={"sub": user.email, "id": user.id},
     )
+    req.app.state.activity.login(user.id)
 
     return LoginResponse(
         access_token=token,
@@ -71,16 +74,20 @@ async def upload_profile_photo_endpoint(
     if not decoded_token.get("sub"):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    filename = f"{decoded_token['id']}.jpg"
-    save_file(user_photo.file, filename)
+    content_type = await run_in_threadpool(image_content_type, user_photo.file)
+    if content_type is None:
+        raise HTTPException(
+            status_code=415, detail="Expected a JPEG, PNG, WebP or GIF image"
+        )
+    digest, _ = await save_blob(db, user_photo.file, content_type)
 
     try:
         await update_user_profile_pic_by_email(
-            db, decoded_token["sub"], f"/uploads/{filename}"
+            db, decoded_token["sub"], blob_url(digest)
         )
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
     return Message(
-        message=f"{filename} uploaded successfully",
+        message=f"{blob_url(digest)} uploaded successfully",
     )
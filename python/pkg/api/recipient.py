@@ -1,8 +1,11 @@
 from typing import Annotated
-from fastapi import HTTPException, Header, Request
+from fastapi import HTTPException, Header, Request, Response
 from fastapi.routing import APIRouter
 
 from pkg.utils import decode_access_token
+from pkg.dashboard import get_dashboard
+from pkg.loaders import get_loaders
+from pkg.serialization import ModelResponse, model_response
 
 from pkg.models import *
 from pkg.database import *
@@ -11,8 +14,12 @@ from pkg.database import *
 recipient_router = APIRouter(prefix="/recipient")
 
 
-@recipient_router.get("/{recipient_id}/requirements")
-async def get_recipient_requirements_endpoint(recipient_id: str, req: Request) -> list:
+@recipient_router.get(
+    "/{recipient_id}/requirements", response_model=list[RequirementWithItems]
+)
+async def get_recipient_requirements_endpoint(
+    recipient_id: str, req: Request
+) -> Response:
     db = req.app.state.db
     try:
         requirement = await get_requirements_by_recipient(db, recipient_id)
@@ -20,11 +27,12 @@ async def get_recipient_requirements_endpoint(recipient_id: str, req: Request) -
             raise HTTPException(
                 status_code=404, detail="No requirements found for this recipient"
             )
-        for i, _ in enumerate(requirement):
-            requirement[i].recipient = await get_recipient_by_requirement(
-                db, requirement[i].id
-            )
-        return requirement
+        recipients = await get_loaders(req).recipients_by_requirement.load_many(
+            r.id for r in requirement
+        )
+        for r, recipient in zip(requirement, recipients):
+            r.recipient = recipient
+        return model_response(list[RequirementWithItems], requirement)
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -46,55 +54,44 @@ async def get_recipient_profile_endpoint(
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@recipient_router.get("/dashboard")
+@recipient_router.get("/dashboard", response_model=Dashboard)
 async def get_recipient_dashboard_endpoint(
     token: Annotated[str | None, Header()], req: Request
-) -> Dashboard:
+) -> Response:
     if not token:
         raise HTTPException(status_code=401, detail="Token is missing")
 
-    if not (email := decode_access_token(token).get("sub")):
+    decoded_token = decode_access_token(token)
+    if not (email := decoded_token.get("sub")):
         raise HTTPException(status_code=401, detail="Invalid token")
 
     db = req.app.state.db
 
     try:
-        recipient = await get_recipient_by_email(db, email)
-        requirements = await get_requirements_by_recipient(db, recipient.id)
-        for i, _ in enumerate(requirements):
-            requirements[i].recipient = recipient
-        funds = await get_funds_by_recipient(db, recipient.id)
+        recipient = await get_loaders(req).recipients_by_email.load(email)
+        return ModelResponse(await get_dashboard(db, RoleEnum.recipient, recipient.id))
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    return Dashboard(
-        funds=funds,
-        requirements=requirements,
-    )
-
 
-@recipient_router.get("{recipient_id}/funds")
-async def get_recipient_funds_endpoint(
-    recipient_id: str, req: Request
-) -> list[DetailFund]:
+@recipient_router.get("{recipient_id}/funds", response_model=list[DetailFund])
+async def get_recipient_funds_endpoint(recipient_id: str, req: Request) -> Response:
     db = req.app.state.db
     funds = await get_funds_by_recipient(db, recipient_id)
     if len(funds) == 0:
         raise HTTPException(status_code=404, detail="No funds found")
-    detailed_funds = []
-    for fund in funds:
-        report = await get_report_by_fund(db, fund.id)
-        volunteer = await get_volunteer_by_fund(db, fund.id)
-        requirements = await get_requirement_by_fund(db, fund.id)
-        requirements.recipient = await get_recipient_by_requirement(db, requirements.id)
-
-        detailed_funds.append(
-            DetailFund(
-                **fund.model_dump(),
-                report=report,
-                volunteer=volunteer,
-                requirement=requirements,
-            )
+    loaders = get_loaders(req)
+
+    async def detail(fund: DetailFund) -> DetailFund:
+        return DetailFund(
+            **fund.model_dump(),
+            report=await get_report_by_fund(db, fund.id),
+            volunteer=await loaders.volunteers_by_fund.load(fund.id),
+            requirement=await loaders.fund_requirement(fund.id),
         )
 
-    return detailed_funds
+    # One query for all the volunteers; detail() then finds them cached.
+    await loaders.volunteers_by_fund.load_many(fund.id for fund in funds)
+    detailed_funds = await loaders.gather(*map(detail, funds))
+
+    return model_response(list[DetailFund], detailed_funds)
@@ -1,18 +1,26 @@
 from typing import Annotated
 from fastapi.routing import APIRouter
-from fastapi import HTTPException, Header, Request
+from fastapi import HTTPException, Header, Query, Request, Response
 from pkg.models import *
 from pkg.database import *
 from pkg.utils import decode_access_token
+from pkg.loaders import get_loaders
+from pkg.records import RequirementRecord
+from pkg.serialization import model_response
+from pkg.importer import (
+    ImportLineTooLong,
+    RequirementImporter,
+    iterate_lines,
+    parse_csv,
+    parse_ndjson,
+)
 
 
 requirement_router = APIRouter(prefix="/requirement")
 
 
-@requirement_router.get("/")
-async def get_requirements_endpoint(
-    req: Request, query: str = ""
-) -> list[RequirementWithItems]:
+@requirement_router.get("/", response_model=list[RequirementWithItems])
+async def get_requirements_endpoint(req: Request, query: str = "") -> Response:
     db = req.app.state.db
     try:
         requirements = await (
@@ -25,7 +33,7 @@ async def get_requirements_endpoint(
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    return requirements
+    return model_response(list[RequirementRecord], requirements)
 
 
 @requirement_router.post("/")
@@ -73,30 +81,73 @@ async def create_items_endpoint(
     return Message(message="Items created")
 
 
+@requirement_router.post("/import")
+async def import_requirements_endpoint(
+    token: Annotated[str, Header()], req: Request
+) -> ImportReport:
+    db = req.app.state.db
+    if not token:
+        raise HTTPException(status_code=401, detail="Token is missing")
+    if not (mail := decode_access_token(token).get("sub")):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    content_type = req.headers.get("content-type", "")
+    if "csv" in content_type:
+        rows = parse_csv(iterate_lines(req.stream()))
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        rows = parse_ndjson(iterate_lines(req.stream()))
+    else:
+        raise HTTPException(
+            status_code=415, detail="Expected text/csv or application/x-ndjson body"
+        )
+
+    try:
+        recipient = await get_recipient_by_email(db, mail)
+    except DatabaseException:
+        raise HTTPException(status_code=404, detail="Recipient not found")
+
+    importer = RequirementImporter(db, recipient.id)
+    try:
+        async for line, row in rows:
+            await importer.add(line, row)
+    except ImportLineTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return await importer.finish()
+
+
 @requirement_router.get("/categories")
 def get_categories() -> dict[str, list[str]]:
     return {"categories": ["Food", "Medicine", "Equipment", "Other"]}
 
 
+@requirement_router.get("/urgent", response_model=list[RequirementWithItems])
+async def get_urgent_requirements_endpoint(
+    req: Request, limit: Annotated[int, Query(ge=1, le=100)] = 10
+) -> Response:
+    db = req.app.state.db
+    requirements = await get_urgent_requirements(db, limit)
+    return model_response(list[RequirementRecord], requirements)
+
+
 @requirement_router.get("/{requirement_id}")
 async def get_requirement_by_id_endpoint(
     requirement_id: str, req: Request
 ) -> RequirementWithItemsAndFund:
     db = req.app.state.db
+    loaders = get_loaders(req)
     try:
-        requirement = await get_requirement(db, requirement_id)
-        requirement.items = await get_items_by_requirement(db, requirement.id)
-        print(requirement.items)
+        requirement, recipient, funds = await loaders.gather(
+            get_requirement(db, requirement_id),
+            loaders.recipients_by_requirement.load_or_none(requirement_id),
+            get_funds_by_requirement(db, requirement_id),
+        )
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
-    result = RequirementWithItemsAndFund(
-        **requirement.model_dump(),
+    return RequirementWithItemsAndFund(
+        **requirement.model_dump(exclude={"recipient"}),
+        recipient=recipient,
+        fund=funds,
     )
-    try:
-        result.recipient = await get_recipient_by_requirement(db, requirement.id)
-        result.fund = await get_funds_by_requirement(db, requirement.id)
-    finally:
-        return result
 
 
 @requirement_router.delete("/{requirement_id}")
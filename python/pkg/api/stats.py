@@ -0,0 +1,13 @@
+from fastapi import Request
+from fastapi.routing import APIRouter
+
+from pkg.models import *
+from pkg.database import *
+
+
+stats_router = APIRouter(prefix="/stats")
+
+
+@stats_router.get("/")
+async def get_stats_endpoint(req: Request) -> Stats:
+    return await get_stats(req.app.state.db)
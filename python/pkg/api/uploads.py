@@ -0,0 +1,57 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.routing import APIRouter
+
+from pkg.storage import (
+    BLOB_CACHE_CONTROL,
+    STORAGE_PRESIGN_SECONDS,
+    blob_disposition,
+    get_storage,
+)
+from pkg.utils import DIGEST
+
+from pkg.models import *
+from pkg.database import *
+
+
+uploads_router = APIRouter(prefix="/uploads")
+
+
+@uploads_router.get("/blobs/{digest}")
+async def get_blob_endpoint(digest: str, req: Request) -> Response:
+    if not DIGEST.fullmatch(digest):
+        raise HTTPException(status_code=404, detail="File not found")
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": BLOB_CACHE_CONTROL,
+        "X-Content-Type-Options": "nosniff",
+    }
+    if headers["ETag"] in req.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    db = req.app.state.db
+    try:
+        blob = await get_blob(db, digest)
+    except DatabaseException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    storage = get_storage()
+    # With object storage and no local cache the client downloads straight
+    # from the bucket; the redirect itself must not outlive the signature.
+    path = await run_in_threadpool(storage.local_path, digest)
+    if path is None:
+        if url := storage.presigned_url(digest, blob.content_type):
+            return RedirectResponse(
+                url,
+                status_code=307,
+                headers={
+                    "Cache-Control": f"private, max-age={STORAGE_PRESIGN_SECONDS // 2}"
+                },
+            )
+        raise HTTPException(status_code=404, detail="File not found")
+    # Only images are shown inline; anything else could be a page running
+    # scripts on this origin.
+    headers["Content-Disposition"] = blob_disposition(blob.content_type)
+    # FileResponse answers Range and If-Range requests and hands the file
+    # to the server when it supports zero-copy sends.
+    return FileResponse(path, media_type=blob.content_type, headers=headers)
@@ -1,10 +1,14 @@
 from typing import Annotated
-from fastapi import HTTPException, Header, Request
+from fastapi import HTTPException, Header, Query, Request, Response
 from fastapi.routing import APIRouter
 
 from pkg.utils import (
     decode_access_token,
 )
+from pkg.dashboard import get_volunteer_dashboard
+from pkg.loaders import get_loaders
+from pkg.records import FundRecord, RequirementRecord, record_fields
+from pkg.serialization import ModelResponse, model_response
 
 from pkg.models import *
 from pkg.database import *
@@ -45,37 +49,27 @@ async def update_volunteer_endpoint(
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@volunteer_router.get("/{volunteer_id}/funds")
-async def get_volunteer_funds_endpoint(
-    volunteer_id: str, req: Request
-) -> list[DetailFund]:
+@volunteer_router.get("/{volunteer_id}/funds", response_model=list[DetailFund])
+async def get_volunteer_funds_endpoint(volunteer_id: str, req: Request) -> Response:
     db = req.app.state.db
     funds = await get_funds_by_volunteer(db, volunteer_id)
     if not funds:
         raise HTTPException(status_code=404, detail="No funds found")
-    detailed_funds = []
-    for fund in funds:
-        report = await get_report_by_fund(db, fund.id)
-        volunteer = await get_volunteer_by_fund(db, fund.id)
-        requirements = None
-        try:
-            requirements = await get_requirement_by_fund(db, fund.id)
-            requirements.recipient = await get_recipient_by_requirement(
-                db, requirements.id
-            )
-        except DatabaseException:
-            requirement = None
-
-        detailed_funds.append(
-            DetailFund(
-                **fund.model_dump(),
-                report=report,
-                volunteer=volunteer,
-                requirement=requirements,
-            )
+    loaders = get_loaders(req)
+
+    async def detail(fund: FundRecord) -> DetailFund:
+        return DetailFund(
+            **record_fields(fund),
+            report=await get_report_by_fund(db, fund.id),
+            volunteer=await loaders.volunteers_by_fund.load(fund.id),
+            requirement=await loaders.fund_requirement_or_none(fund.id),
         )
 
-    return detailed_funds
+    # One query for all the volunteers; detail() then finds them cached.
+    await loaders.volunteers_by_fund.load_many(fund.id for fund in funds)
+    detailed_funds = await loaders.gather(*map(detail, funds))
+
+    return model_response(list[DetailFund], detailed_funds)
 
 
 @volunteer_router.get("/profile")
@@ -102,11 +96,13 @@ async def get_volunteer_profile_endpoint(
     return volunteer
 
 
-@volunteer_router.get("/dashboard")
-async def get_volunteer_dashboard_endpoint(
-    token: Annotated[str | None, Header()], req: Request
-) -> Dashboard:
-
+@volunteer_router.get("/requirements", response_model=list[RequirementWithItems])
+async def get_volunteer_requirements_endpoint(
+    token: Annotated[str | None, Header()],
+    req: Request,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0)] = 0,
+) -> Response:
     if not token:
         raise HTTPException(status_code=401, detail="Token is missing")
 
@@ -114,43 +110,25 @@ async def get_volunteer_dashboard_endpoint(
         raise HTTPException(status_code=401, detail="Invalid token")
 
     db = req.app.state.db
-    detailed_funds = []
-    updated_requirements = []
+    requirements = await get_volunteer_requirements_for_dash(db, email, limit, offset)
+    return model_response(list[RequirementRecord], requirements)
+
+
+@volunteer_router.get("/dashboard", response_model=Dashboard)
+async def get_volunteer_dashboard_endpoint(
+    token: Annotated[str | None, Header()], req: Request
+) -> Response:
 
-    # TODO: Fix searching by email while using id
+    if not token:
+        raise HTTPException(status_code=401, detail="Token is missing")
 
-    volunteer = await get_volunteer_by_email(db, email)  # Ensure volunteer exists
+    decoded_token = decode_access_token(token)
+    if not (email := decoded_token.get("sub")):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    db = req.app.state.db
     try:
-        funds = await get_volunteer_funds_for_dash(db, volunteer.id)
-        for fund in funds:
-            report = await get_report_by_fund(db, fund.id)
-            volunteer = await get_volunteer_by_fund(db, fund.id)
-            requirement = None
-            try:
-                requirement = await get_requirement_by_fund(db, fund.id)
-                requirement.recipient = await get_recipient_by_requirement(
-                    db, requirement.id
-                )
-            except DatabaseException:
-                requirement = None
-            detailed_funds.append(
-                DetailFund(
-                    **fund.model_dump(),
-                    report=report,
-                    volunteer=volunteer,
-                    requirement=requirement,
-                )
-            )
-        requirements = await get_volunteer_requirements_for_dash(db, email)
-        for requirement in requirements:
-            requirement.recipient = await get_recipient_by_requirement(
-                db, requirement.id
-            )
-            updated_requirements.append(requirement)
+        volunteer = await get_loaders(req).volunteers_by_email.load(email)
+        return ModelResponse(await get_volunteer_dashboard(db, volunteer))
     except DatabaseException as e:
         raise HTTPException(status_code=404, detail=str(e))
-
-    return Dashboard(
-        funds=detailed_funds,
-        requirements=updated_requirements,
-    )
@@ -0,0 +1,20 @@
+import asyncio
+import logging
+import os
+
+from pkg.database import Database, collect_blobs
+
+BLOB_GC_SECONDS = float(os.getenv("BLOB_GC_SECONDS", 3600))
+# Unreferenced blobs are kept this long, so an upload can still be attached
+# and clients holding the URL still get the file for a while.
+BLOB_GC_GRACE_SECONDS = float(os.getenv("BLOB_GC_GRACE_SECONDS", 24 * 3600))
+
+
+async def collect_blobs_forever(db: Database):
+    while True:
+        await asyncio.sleep(BLOB_GC_SECONDS)
+        try:
+            if collected := await collect_blobs(db, BLOB_GC_GRACE_SECONDS):
+                logging.info("Collected %d unreferenced uploads", collected)
+        except Exception:
+            logging.exception("Failed to collect unreferenced uploads")
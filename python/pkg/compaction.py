@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+import time
+
+from pkg.database import (
+    Database,
+    compact_items,
+    compact_reports,
+    compact_requirements,
+)
+
+COMPACTION_SECONDS = float(os.getenv("COMPACTION_SECONDS", 600))
+# Deleted requirements keep their rows this long, e.g. for a manual restore.
+COMPACTION_GRACE_SECONDS = float(os.getenv("COMPACTION_GRACE_SECONDS", 24 * 3600))
+# Rows removed per transaction, and the pause between transactions, so a
+# large cleanup never holds the write lock for long.
+COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", 200))
+COMPACTION_PAUSE_SECONDS = float(os.getenv("COMPACTION_PAUSE_SECONDS", 0.5))
+# Local hours, e.g. "8-22" or "22-6", in which compaction waits for the
+# next quiet period. Deleted rows are already hidden, so waiting only
+# costs disk space.
+COMPACTION_PEAK_HOURS = os.getenv("COMPACTION_PEAK_HOURS", "")
+
+
+def is_peak_hour(hour: int, peak_hours: str = COMPACTION_PEAK_HOURS) -> bool:
+    if not peak_hours:
+        return False
+    start, end = (int(h) for h in peak_hours.split("-"))
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+async def compact(db: Database) -> int:
+    # Items first: a requirement is only removed once none are left.
+    cutoff = time.time() - COMPACTION_GRACE_SECONDS
+    removed = 0
+    for step in (
+        lambda: compact_items(db, cutoff, COMPACTION_BATCH_SIZE),
+        lambda: compact_requirements(db, cutoff, COMPACTION_BATCH_SIZE),
+        lambda: compact_reports(db, COMPACTION_BATCH_SIZE),
+    ):
+        while not is_peak_hour(time.localtime().tm_hour):
+            batch = await step()
+            removed += batch
+            if batch < COMPACTION_BATCH_SIZE:
+                break
+            await asyncio.sleep(COMPACTION_PAUSE_SECONDS)
+    return removed
+
+
+async def compact_forever(db: Database):
+    while True:
+        await asyncio.sleep(COMPACTION_SECONDS)
+        try:
+            if removed := await compact(db):
+                logging.info("Compacted %d deleted rows", removed)
+        except Exception:
+            logging.exception("Failed to compact deleted rows")
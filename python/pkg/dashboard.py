@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+from pkg.database import *
+from pkg.events import ChangeEvent
+from pkg.loaders import Loaders
+from pkg.models import *
+from pkg.records import FundRecord, RequirementRecord, record_fields
+from pkg.serialization import get_adapter
+
+
+async def build_volunteer_funds(db: Database, volunteer_id: str) -> list[DetailFund]:
+    loaders = Loaders(db)
+
+    async def detail(fund: FundRecord) -> DetailFund:
+        return DetailFund(
+            **record_fields(fund),
+            report=await get_report_by_fund(db, fund.id),
+            volunteer=await loaders.volunteers_by_fund.load(fund.id),
+            requirement=await loaders.fund_requirement_or_none(fund.id),
+        )
+
+    funds = await get_volunteer_funds_for_dash(db, volunteer_id)
+    await loaders.volunteers_by_fund.load_many(fund.id for fund in funds)
+    return await loaders.gather(*map(detail, funds))
+
+
+async def build_recipient_dashboard(db: Database, recipient_id: str) -> Dashboard:
+    recipient = await Loaders(db).recipients.load(recipient_id)
+    requirements = await get_requirements_by_recipient(db, recipient.id)
+    for requirement in requirements:
+        requirement.recipient = recipient
+    funds = await get_funds_by_recipient(db, recipient.id)
+    return Dashboard(funds=funds, requirements=requirements)
+
+
+# What each role's read model holds and how it is built. A volunteer's
+# requirement feed changes with every requirement anywhere, so only their
+# funds are stored; get_volunteer_dashboard adds the feed on each read.
+DASHBOARD_READ_MODELS = {
+    RoleEnum.volunteer: (list[DetailFund], build_volunteer_funds),
+    RoleEnum.recipient: (Dashboard, build_recipient_dashboard),
+}
+
+
+async def refresh_dashboard(db: Database, role: RoleEnum, owner: str) -> bytes:
+    _, version = await get_dashboard_read_model(db, role, owner)
+    model, build = DASHBOARD_READ_MODELS[role]
+    payload = get_adapter(model).dump_json(await build(db, owner))
+    await store_dashboard_read_model(db, role, owner, payload.decode(), version)
+    return payload
+
+
+async def get_dashboard(db: Database, role: RoleEnum, owner: str) -> bytes:
+    payload, _ = await get_dashboard_read_model(db, role, owner)
+    if payload is not None:
+        return payload.encode()
+    return await refresh_dashboard(db, role, owner)
+
+
+async def get_volunteer_dashboard(db: Database, volunteer: Volunteer) -> bytes:
+    funds, requirements = await asyncio.gather(
+        get_dashboard(db, RoleEnum.volunteer, volunteer.id),
+        get_volunteer_requirements_for_dash(db, volunteer.email),
+    )
+    requirements = get_adapter(list[RequirementRecord]).dump_json(requirements)
+    return b'{"funds":' + funds + b',"requirements":' + requirements + b"}"
+
+
+async def rebuild_dashboards(db: Database) -> int:
+    rebuilt = 0
+    for role, owner in await get_user_roles(db):
+        try:
+            await refresh_dashboard(db, role, owner)
+            rebuilt += 1
+        except DatabaseException as e:
+            logging.warning("Skipping %s dashboard %s: %s", role.value, owner, e)
+    return rebuilt
+
+
+class DashboardProjector:
+    # Rebuilds the read models of the users named in a change event in the
+    # background.
+    def __init__(self, db: Database):
+        self.db = db
+        self._running: set[tuple[RoleEnum, str]] = set()
+        self._dirty: set[tuple[RoleEnum, str]] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def __call__(self, event: ChangeEvent):
+        for role, owners in (
+            (RoleEnum.volunteer, event.volunteers),
+            (RoleEnum.recipient, event.recipients),
+        ):
+            for owner in owners:
+                self.schedule(role, owner)
+
+    def schedule(self, role: RoleEnum, owner: str):
+        key = (role, owner)
+        if key in self._running:
+            self._dirty.add(key)
+            return
+        self._running.add(key)
+        task = asyncio.create_task(self._refresh(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: tuple[RoleEnum, str]):
+        try:
+            while True:
+                self._dirty.discard(key)
+                try:
+                    await refresh_dashboard(self.db, *key)
+                except Exception:
+                    logging.exception("Failed to refresh %s dashboard %s", *key)
+                if key not in self._dirty:
+                    break
+        finally:
+            self._running.discard(key)
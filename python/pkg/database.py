@@ -1,47 +1,212 @@
+import asyncio
+import os
+import time
 import uuid
 from pkg.models import (
+    Blob,
     DetailFund,
-    Fund,
     FundCreate,
-    Item,
+    ItemReservationCreate,
     Recipient,
     Report,
     ReportBase,
+    ReportDocument,
+    ReportSearchResult,
     RequirementBase,
     RequirementCreate,
     ItemBase,
     RequirementWithItems,
+    RoleEnum,
+    Stats,
     StatusEnum,
     Volunteer,
 )
 from databases import Database as DatabaseCore
-import asyncpg
 
-from pkg.utils import verify_password
+from pkg.events import ChangeEvent, EventHub
+from pkg.records import (
+    FundRecord,
+    ItemRecord,
+    RecipientRecord,
+    RequirementRecord,
+    fund_record,
+)
+from pkg.queries import (
+    QUERIES,
+    NamedQuery,
+    Row,
+    RowDatabase,
+    expand_in,
+    named_to_positional,
+    register,
+)
+from pkg.replicas import ReadRouter
+from pkg.sqlite import SQLITE_READERS, SQLiteDatabase, sqlite_performance_mode
+from pkg.urgency import UrgentRequirementQueue
+from pkg.storage import get_storage, stage_file
+from pkg.utils import blob_digest, verify_password
 
 
-class DatabasePg:
-    def __init__(self, db_url: str):
-        self.db_url = db_url
+SQLITE_URL = "sqlite+aiosqlite:///database.db"
 
-    async def connect(self):
-        self.conn = await asyncpg.connect(self.db_url)
+# Bump whenever create_tables changes; databases already at this version
+# skip the DDL on boot.
+SCHEMA_VERSION = 8
 
-    async def disconnect(self):
-        await self.conn.close()
+
+def get_database_url() -> str:
+    url = os.getenv("DATABASE_URL") or SQLITE_URL
+    # databases only understands the postgresql scheme.
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url.removeprefix("postgres://")
+    return url
+
+
+WARMUP_VALUES = {
+    "requirement_ids": [],
+    "keys": [],
+    "limit": 1,
+    "offset": 0,
+    "top": 1,
+    "terms": '""',
+}
 
 
 class DatabaseException(Exception): ...
 
 
+class ReservationConflict(DatabaseException): ...
+
+
 class Database:
-    def __init__(self, db_name: str):
-        self.connection = DatabaseCore(db_name)
+    def __init__(
+        self, db_name: str, replica_urls: list[str] = [], pool_size: int | None = None
+    ):
+        # connection is the primary; reads that may lag behind it go through
+        # reader, which picks a replica when one is configured and healthy.
+        # pool_size caps the connections this process opens to each server.
+        options = {}
+        if pool_size and db_name.startswith("postgresql"):
+            options = {"min_size": 1, "max_size": pool_size}
+        if sqlite_performance_mode(db_name):
+            # SQLite takes one writer at a time: every write of this process
+            # queues for the one writer connection instead of retrying on
+            # "database is locked", while WAL lets the read-only pool run
+            # beside it.
+            self.connection = SQLiteDatabase(db_name, pool_size=1)
+            local = SQLiteDatabase(db_name, pool_size=SQLITE_READERS, query_only=True)
+        else:
+            self.connection = RowDatabase(db_name, **options)
+            local = None
+        self.reader = ReadRouter(self.connection, replica_urls, options, local)
+        self.events = EventHub()
+        self.urgent = UrgentRequirementQueue()
+        self.events.add_remote_listener(self._on_remote_change)
+
+    def _on_remote_change(self, event: ChangeEvent):
+        # Requirements changed by other workers only reach this process as
+        # relayed events; the urgent queue reloads on its next read.
+        if event.type.startswith(("requirement.", "fund.")):
+            self.urgent.invalidate()
+
+    @property
+    def dialect(self) -> str:
+        return self.connection.url.dialect
 
     async def connect(self):
         await self.connection.connect()
+        await self.reader.connect()
+
+    async def fetch_all(self, name: str, values: dict | None = None) -> list[Row]:
+        return await self.reader.run(
+            lambda connection: self._fetch(connection, QUERIES[name], values or {})
+        )
+
+    async def _fetch(
+        self, database: DatabaseCore, query: NamedQuery, values: dict
+    ) -> list[Row]:
+        # Runs a registered query with the text written for this backend,
+        # straight on the driver connection of the current task.
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            if database.url.dialect == "postgresql":
+                records = await raw.fetch(query.postgres, *query.postgres_bind(values))
+                return [Row(r.items()) for r in records]
+            sql, params = query.sqlite_bind(values)
+            async with raw.execute(sql, params) as cursor:
+                columns = [c[0] for c in cursor.description]
+                return [Row(zip(columns, r)) for r in await cursor.fetchall()]
+
+    async def fetch_one(self, name: str, values: dict | None = None) -> Row | None:
+        rows = await self.fetch_all(name, values)
+        return rows[0] if rows else None
+
+    async def warm_up(self, connections: int):
+        # Opens several pooled connections on the primary, the local read
+        # pool and every replica and runs each registered query once on them
+        # with values that match nothing, so asyncpg has them prepared
+        # before the first request.
+        async def warm(database: DatabaseCore):
+            for query in QUERIES.values():
+                await self._fetch(
+                    database,
+                    query,
+                    {name: WARMUP_VALUES.get(name, "") for name in query.params},
+                )
+
+        await asyncio.gather(*(warm(self.connection) for _ in range(connections)))
+        if self.reader.local is not None:
+            await asyncio.gather(*(warm(self.reader.local) for _ in range(connections)))
+        for replica in self.reader.replicas:
+            if not replica.healthy:
+                continue
+            try:
+                await asyncio.gather(
+                    *(warm(replica.connection) for _ in range(connections))
+                )
+            except Exception as e:
+                replica.eject(e)
+
+    async def explain(self, name: str, values: dict | None = None) -> list[str]:
+        query = QUERIES[name]
+        async with self.connection.connection() as connection:
+            raw = connection.raw_connection
+            if self.dialect == "postgresql":
+                records = await raw.fetch(
+                    f"EXPLAIN {query.postgres}", *query.postgres_bind(values or {})
+                )
+                return [r[0] for r in records]
+            sql, params = query.sqlite_bind(values or {})
+            async with raw.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+                depth: dict[int, int] = {0: 0}
+                lines = []
+                for id, parent, _, detail in await cursor.fetchall():
+                    depth[id] = depth.get(parent, 0) + 1
+                    lines.append("  " * (depth[id] - 1) + detail)
+                return lines
+
+    async def migrate(self) -> bool:
+        try:
+            version = await self.connection.fetch_val(
+                "SELECT MAX(Version) FROM SchemaVersion"
+            )
+        except Exception:
+            version = None
+        # A newer version means a newer release is rolling out; leave its
+        # schema alone.
+        if version is not None and version >= SCHEMA_VERSION:
+            return False
+        await self.create_tables()
+        await self.connection.execute(
+            query="INSERT INTO SchemaVersion (Version) VALUES (:version)",
+            values={"version": SCHEMA_VERSION},
+        )
+        return True
 
     async def create_tables(self):
+        await self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS SchemaVersion (Version INTEGER NOT NULL)"
+        )
         await self.connection.execute(
             """ CREATE TABLE IF NOT EXISTS Specific (
         ID TEXT PRIMARY KEY,
@@ -61,7 +226,7 @@ CREATE TABLE IF NOT EXISTS Volunteer (
         Name TEXT,
         Surname TEXT,
         Age TEXT,
-        Specific INTEGER,
+        Specific TEXT,
         Available BOOLEAN default true,
         FOREIGN KEY (Specific) REFERENCES Specific(ID)
 ); """
@@ -92,6 +257,18 @@ CREATE TABLE IF NOT EXISTS Fund (
         FOREIGN KEY (Volunteer) REFERENCES Volunteer(ID)
 ); """
         )
+        await self.add_column("Fund", "ReportFile", "TEXT")
+
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS Recipient (
+    ID TEXT PRIMARY KEY,
+    Name TEXT NOT NULL,
+    Email TEXT,
+    PasswordHash TEXT,
+    ProfilePic TEXT
+); """
+        )
 
         await self.connection.execute(
             """
@@ -100,11 +277,16 @@ CREATE TABLE IF NOT EXISTS Requirement (
         Deadline DATE,
         Name TEXT NOT NULL,
         Priority TEXT CHECK (Priority IN ('Default', 'High')),
+        Fund TEXT,
         Description TEXT,
         Recipient TEXT,
         FOREIGN KEY (Recipient) REFERENCES Recipient(ID)
 ); """
         )
+        await self.add_column("Requirement", "Fund", "TEXT")
+        # Deleted requirements keep their row until pkg.compaction removes
+        # it with its items; DeletedAt is when (epoch seconds).
+        await self.add_column("Requirement", "DeletedAt", "DOUBLE PRECISION")
 
         await self.connection.execute(
             """
@@ -115,27 +297,271 @@ CREATE TABLE IF NOT EXISTS Requirement (
         Requirement TEXT,
         Category TEXT CHECK (Category IN ('Food', 'Medicine', 'Equipment', 'Other')),
         ReservedBy TEXT,
-        FOREIGN KEY (Requirement) REFERENCES Requirement(ID)
+        FOREIGN KEY (Requirement) REFERENCES Requirement(ID),
         FOREIGN KEY (ReservedBy) REFERENCES Fund(ID)
 ); """
         )
+        await self.add_column("Item", "Remaining", "INTEGER")
 
         await self.connection.execute(
             """
-CREATE TABLE IF NOT EXISTS Recipient (
-    ID TEXT PRIMARY KEY,
-    Name TEXT NOT NULL,
-    Email TEXT,
-    PasswordHash TEXT,
-    ProfilePic TEXT
+CREATE TABLE IF NOT EXISTS ItemReservation (
+        Item TEXT NOT NULL,
+        Fund TEXT NOT NULL,
+        Quantity INTEGER NOT NULL CHECK (Quantity > 0),
+        PRIMARY KEY (Item, Fund),
+        FOREIGN KEY (Item) REFERENCES Item(ID),
+        FOREIGN KEY (Fund) REFERENCES Fund(ID)
+); """
+        )
+        # Items reserved before the ledger existed were taken in full by
+        # ReservedBy.
+        await self.connection.execute(
+            """
+INSERT INTO ItemReservation (Item, Fund, Quantity)
+SELECT ID, ReservedBy, Count FROM Item
+WHERE Remaining IS NULL AND ReservedBy IS NOT NULL AND Count > 0
+ON CONFLICT DO NOTHING
+"""
+        )
+        await self.connection.execute(
+            """
+UPDATE Item SET Remaining = CASE WHEN ReservedBy IS NULL THEN Count ELSE 0 END
+WHERE Remaining IS NULL
+"""
+        )
+
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS RateLimitBucket (
+    Key TEXT PRIMARY KEY,
+    Tokens REAL NOT NULL,
+    Updated REAL NOT NULL
+); """
+        )
+
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS DashboardReadModel (
+    Role TEXT NOT NULL,
+    Owner TEXT NOT NULL,
+    Version INTEGER NOT NULL DEFAULT 0,
+    Payload TEXT,
+    UpdatedAt TIMESTAMP,
+    PRIMARY KEY (Role, Owner)
+); """
+        )
+        # Read models are rebuilt on the next read; dropping them on upgrade
+        # keeps stored payloads in the shape the new release expects.
+        await self.connection.execute(
+            "UPDATE DashboardReadModel SET Payload = NULL, Version = Version + 1"
+        )
+
+        # Uploads stored by SHA-256. RefCount counts the Picture, ProfilePic
+        # and ReportFile columns pointing at the blob; UpdatedAt (epoch
+        # seconds) is when it was last uploaded or released.
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS Blob (
+    Digest TEXT PRIMARY KEY,
+    Size INTEGER NOT NULL,
+    ContentType TEXT NOT NULL,
+    RefCount INTEGER NOT NULL DEFAULT 0,
+    UpdatedAt REAL NOT NULL
+); """
+        )
+
+        # The report PDF of each fund and its processing state; the extracted
+        # text goes to ReportSearch. Digest is the PDF being processed: a
+        # newer upload replaces it and the older result is discarded.
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS ReportDocument (
+    Fund TEXT PRIMARY KEY,
+    Digest TEXT NOT NULL,
+    Status TEXT NOT NULL CHECK (Status IN ('Pending', 'Processing', 'Done', 'Failed')),
+    Pages INTEGER,
+    Preview TEXT,
+    Error TEXT,
+    UpdatedAt REAL NOT NULL,
+    FOREIGN KEY (Fund) REFERENCES Fund(ID)
+); """
+        )
+        # Claims of the current upload, capped by REPORT_MAX_ATTEMPTS.
+        await self.add_column(
+            "ReportDocument", "Attempts", "INTEGER NOT NULL DEFAULT 0"
+        )
+        await self.create_report_search()
+
+        # When each volunteer or recipient last logged in and was last seen
+        # (epoch seconds), written in batches by pkg.activity.
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS UserActivity (
+    UserID TEXT PRIMARY KEY,
+    LastLogin DOUBLE PRECISION,
+    LastSeen DOUBLE PRECISION
+); """
+        )
+
+        await self.connection.execute(
+            """
+CREATE TABLE IF NOT EXISTS StatCounter (
+        Name TEXT NOT NULL,
+        Key TEXT NOT NULL,
+        Value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (Name, Key)
 ); """
         )
 
+        for index in (
+            "idx_volunteer_email ON Volunteer (Email)",
+            "idx_recipient_email ON Recipient (Email)",
+            "idx_fund_volunteer ON Fund (Volunteer)",
+            "idx_fund_report ON Fund (Report)",
+            "idx_item_reserved_by ON Item (ReservedBy)",
+            "idx_item_requirement_remaining ON Item (Requirement, Remaining)",
+            "idx_item_reservation_fund ON ItemReservation (Fund)",
+            "idx_live_requirement_fund ON Requirement (Fund) WHERE DeletedAt IS NULL",
+            "idx_live_requirement_recipient ON Requirement (Recipient) WHERE DeletedAt IS NULL",
+            # Matches REQUIREMENT_FEED_ORDER; the IS NULL terms put missing
+            # values last in both dialects.
+            "idx_live_requirement_feed ON Requirement ((Priority IS NULL), Priority DESC, (Deadline IS NULL), Deadline, ID) WHERE DeletedAt IS NULL",
+            "idx_deleted_requirement ON Requirement (DeletedAt) WHERE DeletedAt IS NOT NULL",
+            "idx_blob_refcount_updated ON Blob (RefCount, UpdatedAt)",
+            "idx_report_document_status ON ReportDocument (Status, UpdatedAt)",
+        ):
+            await self.connection.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+        for index in (
+            "idx_item_requirement",
+            "idx_requirement_fund",
+            "idx_requirement_priority_deadline",
+            "idx_live_requirement_priority_deadline",
+        ):
+            await self.connection.execute(f"DROP INDEX IF EXISTS {index}")
+
+        await self.connection.execute(
+            f"""
+{"CREATE OR REPLACE VIEW" if self.dialect == "postgresql" else "CREATE VIEW IF NOT EXISTS"} UserIdentity AS
+SELECT ID, Email, PasswordHash, 'Volunteer' AS Role, Name, Surname, Phone, Age, Available, ProfilePic
+FROM Volunteer
+UNION ALL
+SELECT ID, Email, PasswordHash, 'Recipient' AS Role, Name, NULL, NULL, NULL, NULL, ProfilePic
+FROM Recipient
+; """
+        )
+
+    async def create_report_search(self):
+        # ReportSearch holds the searchable text of each fund's report: the
+        # final conclusion and the text extracted from the PDF.
+        if self.dialect == "postgresql":
+            # 'simple' because there is no Ukrainian stemmer to configure.
+            await self.connection.execute(
+                """
+CREATE TABLE IF NOT EXISTS ReportSearch (
+    Fund TEXT PRIMARY KEY REFERENCES Fund(ID),
+    Conclusion TEXT,
+    Body TEXT,
+    Document tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(Conclusion, '') || ' ' || coalesce(Body, ''))
+    ) STORED
+); """
+            )
+            await self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_report_search_document ON ReportSearch USING GIN (Document)"
+            )
+        else:
+            await self.connection.execute(
+                """
+CREATE TABLE IF NOT EXISTS ReportSearch (
+    Fund TEXT PRIMARY KEY,
+    Conclusion TEXT,
+    Body TEXT,
+    FOREIGN KEY (Fund) REFERENCES Fund(ID)
+); """
+            )
+            # An external content FTS5 index over ReportSearch, kept in step
+            # by triggers.
+            await self.connection.execute(
+                """
+CREATE VIRTUAL TABLE IF NOT EXISTS ReportSearchIndex USING fts5(
+    Conclusion, Body, content='ReportSearch', content_rowid='rowid'
+); """
+            )
+            for trigger in (
+                """
+CREATE TRIGGER IF NOT EXISTS report_search_insert AFTER INSERT ON ReportSearch BEGIN
+    INSERT INTO ReportSearchIndex (rowid, Conclusion, Body)
+    VALUES (new.rowid, new.Conclusion, new.Body);
+END""",
+                """
+CREATE TRIGGER IF NOT EXISTS report_search_delete AFTER DELETE ON ReportSearch BEGIN
+    INSERT INTO ReportSearchIndex (ReportSearchIndex, rowid, Conclusion, Body)
+    VALUES ('delete', old.rowid, old.Conclusion, old.Body);
+END""",
+                """
+CREATE TRIGGER IF NOT EXISTS report_search_update AFTER UPDATE ON ReportSearch BEGIN
+    INSERT INTO ReportSearchIndex (ReportSearchIndex, rowid, Conclusion, Body)
+    VALUES ('delete', old.rowid, old.Conclusion, old.Body);
+    INSERT INTO ReportSearchIndex (rowid, Conclusion, Body)
+    VALUES (new.rowid, new.Conclusion, new.Body);
+END""",
+            ):
+                await self.connection.execute(trigger)
+        await self.connection.execute(
+            """
+INSERT INTO ReportSearch (Fund, Conclusion, Body)
+SELECT Fund.ID, Report.FinalConclution, NULL
+FROM Fund JOIN Report ON Report.ID = Fund.Report
+WHERE true
+ON CONFLICT (Fund) DO NOTHING
+"""
+        )
+
+    async def add_column(self, table: str, column: str, definition: str):
+        if self.dialect == "postgresql":
+            await self.connection.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}"
+            )
+            return
+        try:
+            await self.connection.execute(
+                f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+            )
+        except Exception as e:
+            if "duplicate column" not in str(e):
+                raise
+
     async def disconnect(self):
+        await self.reader.disconnect()
         await self.connection.disconnect()
 
+    async def execute_many(self, query: str, values: list[dict]):
+        # databases compiles every parameter set through SQLAlchemy; hand the
+        # whole batch to the driver instead. Runs on the task's connection,
+        # so it joins an open transaction.
+        async with self.connection.connection() as connection:
+            raw = connection.raw_connection
+            if self.dialect == "postgresql":
+                query, names = named_to_positional(query)
+                await raw.executemany(
+                    query, [tuple(v[name] for name in names) for v in values]
+                )
+            else:
+                await raw.executemany(query, values)
+
+
+# Deleted requirements keep their rows, and their items, until compaction.
+# Reads leave them out with these conditions; the partial indexes on
+# Requirement are declared with the same one, so the planner can use them.
+LIVE_REQUIREMENT = "Requirement.DeletedAt IS NULL"
+LIVE_ITEM = """EXISTS (
+    SELECT 1 FROM Requirement AS Live
+    WHERE Live.ID = Item.Requirement AND Live.DeletedAt IS NULL
+)"""
 
-async def get_funds_by_volunteer(db: Database, volunteer_id: str) -> list[Fund]:
+
+async def get_funds_by_volunteer(db: Database, volunteer_id: str) -> list[FundRecord]:
     query = """
 SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture,
              Fund.LongJarID
@@ -144,100 +570,78 @@ JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
 WHERE Fund.Volunteer = :volunteer_id
 """
 
-    rows = await db.connection.fetch_all(
-        query=query, values={"volunteer_id": volunteer_id}
-    )
+    rows = await db.reader.fetch_all(query=query, values={"volunteer_id": volunteer_id})
 
     if rows:
-        return [
-            Fund(
-                id=f["ID"],
-                name=f["Name"],
-                description=f["Description"],
-                mono_jar_url=f["MonoJarUrl"],
-                status=f["Status"],
-                picture=f["Picture"],
-                long_jar_id=f["LongJarID"],
-            )
-            for f in rows
-        ]
+        return [fund_record(f) for f in rows]
     return []
 
 
-async def get_funds(db: Database, search_line: str = "") -> list[Fund]:
-    query = """
-SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID,
+FUND_LIST = register(
+    "fund.list",
+    """
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
+FROM Fund
+JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
+""",
+)
+
+# LIKE is case-insensitive for ASCII on SQLite only.
+FUND_SEARCH = register(
+    "fund.search",
+    """
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
 FROM Fund
 JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
-"""
-    if search_line != "":
-        query += """
 WHERE Fund.Name LIKE :search_line OR Volunteer.Name LIKE :search_line OR Volunteer.Surname LIKE :search_line
-"""
-    rows = await db.connection.fetch_all(
-        query=query,
-        values={"search_line": f"%{search_line}%"} if search_line != "" else {},
+""",
+    """
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
+FROM Fund
+JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
+WHERE Fund.Name ILIKE :search_line OR Volunteer.Name ILIKE :search_line OR Volunteer.Surname ILIKE :search_line
+""",
+)
+
+
+async def get_funds(db: Database, search_line: str = "") -> list[FundRecord]:
+    rows = await (
+        db.fetch_all(FUND_SEARCH, {"search_line": f"%{search_line}%"})
+        if search_line != ""
+        else db.fetch_all(FUND_LIST)
     )
     if rows:
-        return [
-            Fund(
-                id=f["ID"],
-                name=f["Name"],
-                description=f["Description"],
-                mono_jar_url=f["MonoJarUrl"],
-                status=f["Status"],
-                picture=f["Picture"],
-                long_jar_id=f["LongJarID"],
-            )
-            for f in rows
-        ]
+        return [fund_record(f) for f in rows]
 
     return []
 
 
-async def get_fund_by_id(db: Database, fund_id: str) -> Fund:
+async def get_fund_by_id(db: Database, fund_id: str) -> FundRecord:
     query = """
 SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
 FROM Fund WHERE Fund.ID = :fund_id
 """
-    row = await db.connection.fetch_one(query=query, values={"fund_id": fund_id})
+    row = await db.reader.fetch_one(query=query, values={"fund_id": fund_id})
     if row:
-        return Fund(
-            id=row["ID"],
-            name=row["Name"],
-            description=row["Description"],
-            mono_jar_url=row["MonoJarUrl"],
-            status=row["Status"],
-            picture=row["Picture"],
-            long_jar_id=row["LongJarID"],
-        )
+        return fund_record(row)
     raise DatabaseException("Fund not found")
 
 
-async def get_funds_by_requirement(db: Database, requirement_id: str) -> list[Fund]:
-    query = """
+async def get_funds_by_requirement(
+    db: Database, requirement_id: str
+) -> list[FundRecord]:
+    query = f"""
 SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
 FROM Fund
 JOIN Requirement ON Fund.ID = Requirement.Fund
-WHERE Requirement.ID = :requirement_id
+WHERE Requirement.ID = :requirement_id AND {LIVE_REQUIREMENT}
 """
-    rows = await db.connection.fetch_all(
+    rows = await db.reader.fetch_all(
         query=query, values={"requirement_id": requirement_id}
     )
 
     if rows:
-        return [
-            Fund(
-                id=f["ID"],
-                name=f["Name"],
-                description=f["Description"],
-                mono_jar_url=f["MonoJarUrl"],
-                status=f["Status"],
-                picture=f["Picture"],
-                long_jar_id=f["LongJarID"],
-            )
-            for f in rows
-        ]
+        return [fund_record(f) for f in rows]
     return []
 
 
@@ -248,7 +652,7 @@ FROM Volunteer
 JOIN Fund ON Volunteer.ID = Fund.Volunteer
 WHERE Fund.ID = :fund_id
 """
-    row = await db.connection.fetch_one(query=query, values={"fund_id": fund_id})
+    row = await db.reader.fetch_one(query=query, values={"fund_id": fund_id})
     if row:
         return Volunteer(
             id=row["ID"],
@@ -264,15 +668,15 @@ WHERE Fund.ID = :fund_id
 
 async def get_requirement_by_fund(db: Database, fund_id: str) -> RequirementWithItems:
     print(f"Getting requirement for fund {fund_id}")
-    query = """
+    query = f"""
 SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority, Requirement.Description
 FROM Requirement
 JOIN Item on Item.Requirement = Requirement.ID
-JOIN Fund on Item.ReservedBy = Fund.ID
-WHERE Fund.ID = :fund_id
+JOIN ItemReservation on ItemReservation.Item = Item.ID
+WHERE ItemReservation.Fund = :fund_id AND {LIVE_REQUIREMENT}
 GROUP BY Requirement.ID
 """
-    row = await db.connection.fetch_one(query=query, values={"fund_id": fund_id})
+    row = await db.reader.fetch_one(query=query, values={"fund_id": fund_id})
     if row:
         return RequirementWithItems(
             id=row["ID"],
@@ -292,7 +696,7 @@ FROM Report
 JOIN Fund ON Report.ID = Fund.Report
 WHERE Fund.ID = :fund_id
 """
-    row = await db.connection.fetch_one(query=query, values={"fund_id": fund_id})
+    row = await db.reader.fetch_one(query=query, values={"fund_id": fund_id})
     if row:
         return Report(
             id=row["ID"],
@@ -303,180 +707,246 @@ WHERE Fund.ID = :fund_id
 
 
 async def delete_requirement(db: Database, requirement_id: str):
-    query = "DELETE FROM Requirement WHERE ID = :requirement_id"
-    await db.connection.execute(query=query, values={"requirement_id": requirement_id})
+    # Only marks the requirement; pkg.compaction.compact removes its items and
+    # then the requirement later, in small batches (compact_items,
+    # compact_requirements). Its items leave the stats right away.
+    event = await get_requirement_change(db, "requirement.deleted", requirement_id)
+    async with db.connection.transaction():
+        query = """
+UPDATE Requirement SET DeletedAt = :now
+WHERE ID = :requirement_id AND DeletedAt IS NULL
+RETURNING Priority
+"""
+        row = await db.connection.fetch_one(
+            query=query, values={"requirement_id": requirement_id, "now": time.time()}
+        )
+        if row is not None:
+            items = await db.connection.fetch_all(
+                query="SELECT Category, Count, Remaining FROM Item WHERE Requirement = :requirement_id",
+                values={"requirement_id": requirement_id},
+            )
+            await bump_stats(
+                db,
+                [("requirements_by_priority", row["Priority"], -1)]
+                + [
+                    change
+                    for i in items
+                    for change in (
+                        ("items_by_category", i["Category"], -1),
+                        ("outstanding_by_category", i["Category"], -i["Remaining"]),
+                        ("item_quantity", "outstanding", -i["Remaining"]),
+                        ("item_quantity", "reserved", i["Remaining"] - i["Count"]),
+                    )
+                ],
+            )
+    db.urgent.remove(requirement_id)
+    await record_change(db, event)
 
 
 async def get_requirements(
     db: Database, search_line: str | None = None
-) -> list[RequirementWithItems]:
+) -> list[RequirementRecord]:
     query = (
-        """
+        f"""
 SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority, Requirement.Description
 FROM Requirement
-WHERE Requirement.Name LIKE :search_line OR Requirement.Description LIKE :search_line
+WHERE (Requirement.Name LIKE :search_line OR Requirement.Description LIKE :search_line)
+    AND {LIVE_REQUIREMENT}
 """
         if search_line
-        else "SELECT * FROM Requirement"
+        else f"SELECT * FROM Requirement WHERE {LIVE_REQUIREMENT}"
     )
-    rows = await db.connection.fetch_all(
+    rows = await db.reader.fetch_all(
         query=query, values={"search_line": f"%{search_line}%"} if search_line else {}
     )
     if rows:
         return [
-            RequirementWithItems(
-                id=r["ID"],
-                name=r["Name"],
-                deadline=r["Deadline"],
-                priority=r["Priority"],
-                description=r["Description"],
+            RequirementRecord(
+                r["ID"], r["Name"], r["Deadline"], r["Priority"], r["Description"]
             )
             for r in rows
         ]
     return []
 
 
-async def get_items_by_requirement(db: Database, requirement_id: str) -> list[Item]:
+def item_from_row(i) -> ItemRecord:
+    return ItemRecord(
+        i["ID"],
+        i["Name"],
+        i["Count"],
+        i["Category"],
+        i["ReservedBy"],
+        i["Count"] - i["Remaining"] if i["Remaining"] is not None else None,
+    )
+
+
+async def get_items_by_requirement(
+    db: Database, requirement_id: str
+) -> list[ItemRecord]:
     print(f"Getting items for requirement {requirement_id}")
-    query = "SELECT id, name, count, category, ReservedBy FROM Item WHERE requirement = :requirement_id"
-    rows = await db.connection.fetch_all(
+    query = "SELECT id, name, count, category, ReservedBy, Remaining FROM Item WHERE requirement = :requirement_id"
+    rows = await db.reader.fetch_all(
         query=query, values={"requirement_id": requirement_id}
     )
     if rows:
-        return [
-            Item(
-                id=i["ID"],
-                name=i["Name"],
-                count=i["Count"],
-                category=i["Category"],
-                reserved_by=i["ReservedBy"],
-            )
-            for i in rows
-        ]
+        return [item_from_row(i) for i in rows]
     return []
 
 
+ITEM_UNTAKEN_BY_REQUIREMENT = register(
+    "item.untaken_by_requirement",
+    """
+SELECT ID, Name, Count, Category, ReservedBy, Remaining
+FROM Item
+WHERE Requirement = :requirement_id AND Remaining > 0
+""",
+)
+
+
 async def get_untaken_items_by_requirement(
     db: Database, requirement_id: str
-) -> list[Item]:
-    query = "SELECT id, name, count, category, ReservedBy FROM Item WHERE requirement = :requirement_id AND ReservedBy IS NULL"
-    rows = await db.connection.fetch_all(
-        query=query, values={"requirement_id": requirement_id}
+) -> list[ItemRecord]:
+    rows = await db.fetch_all(
+        ITEM_UNTAKEN_BY_REQUIREMENT, {"requirement_id": requirement_id}
     )
     if rows:
-        return [
-            Item(
-                id=i["ID"],
-                name=i["Name"],
-                count=i["Count"],
-                category=i["Category"],
-                reserved_by=i["ReservedBy"],
-            )
-            for i in rows
-        ]
+        return [item_from_row(i) for i in rows]
     return []
 
 
-async def get_items(db: Database, search_line: str | None = None) -> list[Item]:
+async def get_items(db: Database, search_line: str | None = None) -> list[ItemRecord]:
     query = (
-        """
-SELECT Item.ID, Item.Name, Item.Count, Item.Category, Item.ReservedBy
+        f"""
+SELECT Item.ID, Item.Name, Item.Count, Item.Category, Item.ReservedBy, Item.Remaining
 FROM Item
-WHERE Item.Name LIKE :search_line OR Item.Category LIKE :search_line
+WHERE (Item.Name LIKE :search_line OR Item.Category LIKE :search_line) AND {LIVE_ITEM}
 """
         if search_line
-        else "SELECT * FROM Item"
+        else f"SELECT * FROM Item WHERE {LIVE_ITEM}"
     )
-    rows = await db.connection.fetch_all(
+    rows = await db.reader.fetch_all(
         query=query, values={"search_line": f"%{search_line}%"} if search_line else {}
     )
     if rows:
-        return [
-            Item(
-                id=i["ID"],
-                name=i["Name"],
-                count=i["Count"],
-                category=i["Category"],
-                reserved_by=i["ReservedBy"],
-            )
-            for i in rows
-        ]
+        return [item_from_row(i) for i in rows]
     return []
 
 
+REQUIREMENT_INSERT = """
+INSERT INTO Requirement (ID, Deadline, Name, Priority, Fund, Description, Recipient)
+VALUES (:id, :deadline, :name, :priority, :fund, :description, :recipient)
+"""
+
+ITEM_INSERT = """
+INSERT INTO Item (ID, Name, Count, Remaining, Requirement, Category)
+VALUES (:id, :name, :count, :count, :requirement_id, :category)
+"""
+
+
+def requirement_insert_values(
+    requirement_id: str, requirement: RequirementBase, recipient_id: str
+) -> dict:
+    return {
+        "id": requirement_id,
+        "deadline": requirement.deadline,
+        "name": requirement.name,
+        "priority": requirement.priority,
+        "fund": getattr(requirement, "fund_id", None),
+        "description": requirement.description,
+        "recipient": recipient_id,
+    }
+
+
+def item_insert_values(item: ItemBase, requirement_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "name": item.name,
+        "count": item.count,
+        "requirement_id": requirement_id,
+        "category": item.category,
+    }
+
+
 async def create_requirement(
     db: Database, requirement: RequirementCreate, recipient_id: str
 ) -> str:
     requirement_id = str(uuid.uuid4())
-
-    query = """
-INSERT INTO Requirement (ID, Deadline, Name, Priority, Fund, Description, Recipient)
-VALUES (:id, :deadline, :name, :priority, :fund, :description, :recipient)
-"""
     await db.connection.execute(
-        query=query,
-        values={
-            "id": requirement_id,
-            "deadline": requirement.deadline,
-            "name": requirement.name,
-            "priority": requirement.priority,
-            "fund": requirement.fund_id,
-            "description": requirement.description,
-            "recipient": recipient_id,
-        },
+        query=REQUIREMENT_INSERT,
+        values=requirement_insert_values(requirement_id, requirement, recipient_id),
+    )
+    await bump_stats(db, [("requirements_by_priority", requirement.priority, 1)])
+    db.urgent.push(requirement_id, requirement.priority, requirement.deadline)
+    await record_change(
+        db,
+        ChangeEvent(
+            "requirement.created",
+            {"requirement_id": requirement_id, "name": requirement.name},
+            recipients=frozenset({recipient_id}),
+            broadcast=frozenset({RoleEnum.volunteer}),
+        ),
     )
     return requirement_id
 
 
 async def create_items(db: Database, items: list[ItemBase], requirement_id: str):
-    for item in items:
-        item_id = str(uuid.uuid4())
-        query = """
-INSERT INTO Item (ID, Name, Count, Requirement, Category)
-VALUES (:id, :name, :count, :requirement_id, :category)
-"""
-        await db.connection.execute(
-            query=query,
-            values={
-                "id": item_id,
-                "name": item.name,
-                "count": item.count,
-                "requirement_id": requirement_id,
-                "category": item.category,
-            },
-        )
+    await insert_requirements_and_items(
+        db, [], [item_insert_values(item, requirement_id) for item in items]
+    )
+    await refresh_urgent_requirements(
+        db, "Requirement.ID = :id", {"id": requirement_id}
+    )
+    await record_change(
+        db,
+        await get_requirement_change(db, "requirement.items_created", requirement_id),
+    )
 
 
-async def user_login(db: Database, email: str, password: str) -> Volunteer | Recipient:
-    query = "SELECT * FROM Volunteer WHERE Email = :email"
-    user = await db.connection.fetch_one(query=query, values={"email": email})
-    if user and verify_password(password, user["PasswordHash"]):
-        return Volunteer(
-            id=user["ID"],
-            email=user["Email"],
-            profile_pic=user["ProfilePic"],
-            phone=user["Phone"],
-            name=user["Name"],
-            surname=user["Surname"],
-            age=user["Age"],
-            available=user["Available"],
-        )
-    query = "SELECT * FROM Recipient WHERE Email = :email"
-    user = await db.connection.fetch_one(query=query, values={"email": email})
-    if user and verify_password(password, user["PasswordHash"]):
-        return Recipient(
-            id=user["ID"],
-            name=user["Name"],
-            email=user["Email"],
-            profile_pic=user["ProfilePic"],
+async def insert_requirements_and_items(
+    db: Database, requirements: list[dict], items: list[dict]
+):
+    async with db.connection.transaction():
+        if requirements:
+            await db.execute_many(REQUIREMENT_INSERT, requirements)
+        if items:
+            await db.execute_many(ITEM_INSERT, items)
+        await bump_stats(
+            db,
+            [("requirements_by_priority", r["priority"], 1) for r in requirements]
+            + [
+                change
+                for i in items
+                for change in (
+                    ("items_by_category", i["category"], 1),
+                    ("outstanding_by_category", i["category"], i["count"]),
+                    ("item_quantity", "outstanding", i["count"]),
+                )
+            ],
         )
-    raise DatabaseException("Invalid email or password")
+    for r in requirements:
+        db.urgent.push(r["id"], r["priority"], r["deadline"])
+
+
+# Both branches of the view filter on an indexed Email column; Volunteer
+# wins when the same email exists in both tables.
+USER_IDENTITY = register(
+    "user.identity",
+    """
+SELECT ID, Email, PasswordHash, Role, Name, Surname, Phone, Age, Available, ProfilePic
+FROM UserIdentity
+WHERE Email = :email
+ORDER BY Role DESC
+LIMIT 1
+""",
+)
 
 
-async def get_user(db: Database, email: str) -> Volunteer | Recipient:
-    query = "SELECT * FROM Volunteer WHERE Email = :email "
-    row = await db.connection.fetch_one(query=query, values={"email": email})
-    if row:
+async def get_user_identity(db: Database, email: str):
+    return await db.fetch_one(USER_IDENTITY, {"email": email})
+
+
+def user_from_identity(row) -> Volunteer | Recipient:
+    if row["Role"] == RoleEnum.volunteer:
         return Volunteer(
             id=row["ID"],
             email=row["Email"],
@@ -487,80 +957,264 @@ async def get_user(db: Database, email: str) -> Volunteer | Recipient:
             age=row["Age"],
             available=row["Available"],
         )
-    query = "SELECT * FROM Recipient WHERE Email = :email"
-    row = await db.connection.fetch_one(query=query, values={"email": email})
+    return Recipient(
+        id=row["ID"],
+        name=row["Name"],
+        email=row["Email"],
+        profile_pic=row["ProfilePic"],
+    )
+
+
+async def user_login(db: Database, email: str, password: str) -> Volunteer | Recipient:
+    row = await get_user_identity(db, email)
+    if verify_password(password, row["PasswordHash"] if row else None):
+        return user_from_identity(row)
+    raise DatabaseException("Invalid email or password")
+
+
+async def get_user(db: Database, email: str) -> Volunteer | Recipient:
+    row = await get_user_identity(db, email)
     if row:
-        return Recipient(
-            id=row["ID"],
-            name=row["Name"],
-            email=row["Email"],
-            profile_pic=row["ProfilePic"],
-        )
+        return user_from_identity(row)
     raise DatabaseException(f"User not found with email: {email}")
 
 
-async def get_volunteer_funds_for_dash(db: Database, volunteer_id: str) -> list[Fund]:
+async def get_volunteer_funds_for_dash(
+    db: Database, volunteer_id: str
+) -> list[FundRecord]:
     query = """
 SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
     FROM Fund
 JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
 WHERE Volunteer.ID = :volunteer_id
 """
-    rows = await db.connection.fetch_all(
-        query=query, values={"volunteer_id": volunteer_id}
-    )
+    rows = await db.reader.fetch_all(query=query, values={"volunteer_id": volunteer_id})
 
     if rows:
-        return [
-            Fund(
-                id=f["ID"],
-                name=f["Name"],
-                description=f["Description"],
-                mono_jar_url=f["MonoJarUrl"],
-                status=f["Status"],
-                picture=f["Picture"],
-                long_jar_id=f["LongJarID"],
-            )
-            for f in rows
-        ]
+        return [fund_record(f) for f in rows]
     return []
 
 
-async def get_volunteer_requirements_for_dash(
-    db: Database, volunteer_mail: str
-) -> list[RequirementWithItems]:
-    query = """
-SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.priority, Requirement.Description
+OPEN_REQUIREMENT = """
+(
+    EXISTS (
+        SELECT 1 FROM Item
+        WHERE Item.Requirement = Requirement.ID AND Item.Remaining > 0
+    )
+    OR NOT EXISTS (SELECT 1 FROM Item WHERE Item.Requirement = Requirement.ID)
+)
+"""
+
+
+async def load_urgent_requirements(db: Database):
+    query = f"""
+SELECT Requirement.ID, Requirement.Priority, Requirement.Deadline
 FROM Requirement
-FULL JOIN Fund ON Requirement.Fund = Fund.ID
-FULL JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
-limit 5
+WHERE {LIVE_REQUIREMENT} AND {OPEN_REQUIREMENT}
 """
     rows = await db.connection.fetch_all(query=query)
+    db.urgent.replace_all([(r["ID"], r["Priority"], r["Deadline"]) for r in rows])
 
-    if rows:
-        return [
-            RequirementWithItems(
-                id=r["ID"],
-                name=r["Name"],
-                deadline=r["Deadline"],
-                priority=r["Priority"],
-                description=r["Description"],
-                items=await get_items_by_requirement(db, r["ID"]),
+
+async def refresh_urgent_requirements(db: Database, condition: str, values: dict):
+    query = f"""
+SELECT Requirement.ID, Requirement.Priority, Requirement.Deadline,
+       CASE WHEN {LIVE_REQUIREMENT} AND {OPEN_REQUIREMENT} THEN 1 ELSE 0 END AS IsOpen
+FROM Requirement
+WHERE {condition}
+"""
+    for r in await db.connection.fetch_all(query=query, values=values):
+        if r["IsOpen"]:
+            db.urgent.push(r["ID"], r["Priority"], r["Deadline"])
+        else:
+            db.urgent.remove(r["ID"])
+
+
+async def get_urgent_requirements(
+    db: Database, limit: int = 10
+) -> list[RequirementRecord]:
+    if db.urgent.is_stale:
+        await load_urgent_requirements(db)
+    return await get_requirements_by_ids(db, db.urgent.top(limit))
+
+
+REQUIREMENT_BY_IDS = register(
+    "requirement.by_ids",
+    f"""
+SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority,
+       Requirement.Description, Recipient.ID AS RecipientID,
+       Recipient.Name AS RecipientName, Recipient.Email AS RecipientEmail
+FROM Requirement
+LEFT JOIN Recipient ON Recipient.ID = Requirement.Recipient
+WHERE Requirement.ID IN (:requirement_ids) AND {LIVE_REQUIREMENT}
+""",
+    f"""
+SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority,
+       Requirement.Description, Recipient.ID AS RecipientID,
+       Recipient.Name AS RecipientName, Recipient.Email AS RecipientEmail
+FROM Requirement
+LEFT JOIN Recipient ON Recipient.ID = Requirement.Recipient
+WHERE Requirement.ID = ANY(:requirement_ids) AND {LIVE_REQUIREMENT}
+""",
+)
+
+
+async def get_requirements_by_ids(
+    db: Database, requirement_ids: list[str]
+) -> list[RequirementRecord]:
+    if not requirement_ids:
+        return []
+    rows = {
+        r["ID"]: r
+        for r in await db.fetch_all(
+            REQUIREMENT_BY_IDS, {"requirement_ids": requirement_ids}
+        )
+    }
+    items = await get_items_by_requirements(db, list(rows))
+    return [
+        requirement_with_items_from_row(rows[id], items[id])
+        for id in requirement_ids
+        if id in rows
+    ]
+
+
+def requirement_with_items_from_row(r, items: list[ItemRecord]) -> RequirementRecord:
+    return RequirementRecord(
+        r["ID"],
+        r["Name"],
+        r["Deadline"],
+        r["Priority"],
+        r["Description"],
+        items,
+        (
+            RecipientRecord(
+                r["RecipientID"],
+                r["RecipientName"],
+                r["RecipientEmail"] or "none@example.com",
             )
-            for r in rows
-        ]
-    return []
+            if r["RecipientID"]
+            else None
+        ),
+    )
+
+
+ITEM_BY_REQUIREMENTS = register(
+    "item.by_requirements",
+    """
+SELECT ID, Name, Count, Category, ReservedBy, Remaining, Requirement
+FROM Item
+WHERE Requirement IN (:requirement_ids)
+ORDER BY ID
+""",
+    """
+SELECT ID, Name, Count, Category, ReservedBy, Remaining, Requirement
+FROM Item
+WHERE Requirement = ANY(:requirement_ids)
+ORDER BY ID
+""",
+)
+
+
+async def get_items_by_requirements(
+    db: Database, requirement_ids: list[str]
+) -> dict[str, list[ItemRecord]]:
+    items: dict[str, list[ItemRecord]] = {id: [] for id in requirement_ids}
+    if not requirement_ids:
+        return items
+    for i in await db.fetch_all(
+        ITEM_BY_REQUIREMENTS, {"requirement_ids": requirement_ids}
+    ):
+        items[i["Requirement"]].append(item_from_row(i))
+    return items
+
+
+# Requirements the volunteer already reserved items for come first, then
+# open requirements attached to one of their funds, then every other
+# requirement that still has untaken items or no items yet. Each group is
+# ordered by priority and deadline, with the ID as a tie-breaker so pages
+# are stable. The first two groups are small; the last one is read in
+# index order (idx_live_requirement_feed) and stops after the rows the page
+# can need, instead of sorting every open requirement.
+REQUIREMENT_FEED_ORDER = """
+Requirement.Priority IS NULL, Requirement.Priority DESC,
+Requirement.Deadline IS NULL, Requirement.Deadline,
+Requirement.ID
+"""
+REQUIREMENT_VOLUNTEER_FEED = register(
+    "requirement.volunteer_feed",
+    f"""
+WITH Reserved AS (
+    SELECT DISTINCT Item.Requirement AS ID
+    FROM Volunteer
+    JOIN Fund ON Fund.Volunteer = Volunteer.ID
+    JOIN ItemReservation ON ItemReservation.Fund = Fund.ID
+    JOIN Item ON Item.ID = ItemReservation.Item
+    WHERE Volunteer.Email = :email
+),
+Owned AS (
+    SELECT Fund.ID
+    FROM Volunteer
+    JOIN Fund ON Fund.Volunteer = Volunteer.ID
+    WHERE Volunteer.Email = :email
+),
+Feed AS (
+    SELECT Reserved.ID, 0 AS Relevance
+    FROM Reserved
+    UNION ALL
+    SELECT Requirement.ID, 1 AS Relevance
+    FROM Owned
+    JOIN Requirement ON Requirement.Fund = Owned.ID
+    WHERE {LIVE_REQUIREMENT} AND {OPEN_REQUIREMENT}
+      AND NOT EXISTS (SELECT 1 FROM Reserved WHERE Reserved.ID = Requirement.ID)
+    UNION ALL
+    SELECT * FROM (
+        SELECT Requirement.ID, 2 AS Relevance
+        FROM Requirement
+        WHERE {LIVE_REQUIREMENT} AND {OPEN_REQUIREMENT}
+          AND NOT EXISTS (SELECT 1 FROM Reserved WHERE Reserved.ID = Requirement.ID)
+          AND NOT EXISTS (SELECT 1 FROM Owned WHERE Owned.ID = Requirement.Fund)
+        ORDER BY {REQUIREMENT_FEED_ORDER}
+        LIMIT :top
+    ) AS Others
+)
+SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority,
+       Requirement.Description, Recipient.ID AS RecipientID,
+       Recipient.Name AS RecipientName, Recipient.Email AS RecipientEmail,
+       Feed.Relevance
+FROM Feed
+JOIN Requirement ON Requirement.ID = Feed.ID
+LEFT JOIN Recipient ON Recipient.ID = Requirement.Recipient
+WHERE {LIVE_REQUIREMENT}
+ORDER BY Feed.Relevance, {REQUIREMENT_FEED_ORDER}
+LIMIT :limit OFFSET :offset
+""",
+)
+
+
+async def get_volunteer_requirements_for_dash(
+    db: Database, volunteer_mail: str, limit: int = 5, offset: int = 0
+) -> list[RequirementRecord]:
+    rows = await db.fetch_all(
+        REQUIREMENT_VOLUNTEER_FEED,
+        {
+            "email": volunteer_mail,
+            "limit": limit,
+            "offset": offset,
+            "top": limit + offset,
+        },
+    )
+    items = await get_items_by_requirements(db, [r["ID"] for r in rows])
+    return [requirement_with_items_from_row(r, items[r["ID"]]) for r in rows]
 
 
 async def get_recipient_by_requirement(db: Database, requirement_id: str) -> Recipient:
-    query = """
+    query = f"""
 SELECT Recipient.ID, Recipient.Name, Recipient.Email
 FROM Recipient
 JOIN Requirement ON Recipient.ID = Requirement.Recipient
-WHERE Requirement.ID = :requirement_id
+WHERE Requirement.ID = :requirement_id AND {LIVE_REQUIREMENT}
 """
-    row = await db.connection.fetch_one(
+    row = await db.reader.fetch_one(
         query=query, values={"requirement_id": requirement_id}
     )
     if row:
@@ -578,33 +1232,22 @@ SELECT Volunteer.ID, Volunteer.Name, Volunteer.Surname, Volunteer.Email, Volunte
 FROM Volunteer
 WHERE Volunteer.Email = :email
 """
-    row = await db.connection.fetch_one(query=query, values={"email": email})
+    row = await db.reader.fetch_one(query=query, values={"email": email})
     if row:
-        return Volunteer(
-            id=row["ID"],
-            name=row["Name"] or "No name",
-            surname=row["Surname"] or "",
-            email=row["Email"] or "null@example.com",
-            phone=row["Phone"] or "",
-            age=row["Age"] or "",
-            available=row["Available"],
-            profile_pic=row["ProfilePic"] or "",
-        )
+        return volunteer_from_row(row)
     raise DatabaseException("Volunteer not found")
 
 
 async def get_requirements_by_recipient(
     db: Database, recipient_id: str
 ) -> list[RequirementWithItems]:
-    query = """
+    query = f"""
 SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority, Requirement.Description
 FROM Requirement
 JOIN Recipient ON Requirement.Recipient = Recipient.ID
-WHERE Recipient.ID = :recipient_id
+WHERE Requirement.Recipient = :recipient_id AND {LIVE_REQUIREMENT}
 """
-    rows = await db.connection.fetch_all(
-        query=query, values={"recipient_id": recipient_id}
-    )
+    rows = await db.reader.fetch_all(query=query, values={"recipient_id": recipient_id})
     if rows:
         return [
             RequirementWithItems(
@@ -625,7 +1268,7 @@ SELECT Recipient.ID, Recipient.Name
 FROM Recipient
 WHERE Recipient.Email = :email
 """
-    row = await db.connection.fetch_one(query=query, values={"email": email})
+    row = await db.reader.fetch_one(query=query, values={"email": email})
     if row:
         return Recipient(
             id=row["ID"],
@@ -635,6 +1278,109 @@ WHERE Recipient.Email = :email
     raise DatabaseException("Recipient not found")
 
 
+async def get_recipient_by_id(db: Database, recipient_id: str) -> Recipient:
+    query = """
+SELECT Recipient.ID, Recipient.Name, Recipient.Email
+FROM Recipient
+WHERE Recipient.ID = :recipient_id
+"""
+    row = await db.reader.fetch_one(query=query, values={"recipient_id": recipient_id})
+    if row:
+        return Recipient(
+            id=row["ID"],
+            name=row["Name"],
+            email=row["Email"] or "none@example.com",
+        )
+    raise DatabaseException("Recipient not found")
+
+
+def register_lookup(name: str, select: str, column: str) -> str:
+    # Rows whose column is one of :keys, returned with the matching key as
+    # LookupKey. These back the request-scoped loaders in pkg.loaders.
+    return register(
+        name,
+        f"{select}\nWHERE {column} IN (:keys)",
+        f"{select}\nWHERE {column} = ANY(:keys)",
+    )
+
+
+VOLUNTEER_COLUMNS = """Volunteer.ID, Volunteer.Name, Volunteer.Surname, Volunteer.Email,
+       Volunteer.Phone, Volunteer.Age, Volunteer.Available, Volunteer.ProfilePic"""
+RECIPIENT_COLUMNS = "Recipient.ID, Recipient.Name, Recipient.Email"
+FUND_COLUMNS = """Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status,
+       Fund.Picture, Fund.LongJarID"""
+
+VOLUNTEER_BY_IDS = register_lookup(
+    "volunteer.by_ids",
+    f"SELECT {VOLUNTEER_COLUMNS}, Volunteer.ID AS LookupKey FROM Volunteer",
+    "Volunteer.ID",
+)
+VOLUNTEER_BY_EMAILS = register_lookup(
+    "volunteer.by_emails",
+    f"SELECT {VOLUNTEER_COLUMNS}, Volunteer.Email AS LookupKey FROM Volunteer",
+    "Volunteer.Email",
+)
+VOLUNTEER_BY_FUNDS = register_lookup(
+    "volunteer.by_funds",
+    f"""SELECT {VOLUNTEER_COLUMNS}, Fund.ID AS LookupKey
+FROM Fund JOIN Volunteer ON Volunteer.ID = Fund.Volunteer""",
+    "Fund.ID",
+)
+RECIPIENT_BY_IDS = register_lookup(
+    "recipient.by_ids",
+    f"SELECT {RECIPIENT_COLUMNS}, Recipient.ID AS LookupKey FROM Recipient",
+    "Recipient.ID",
+)
+RECIPIENT_BY_EMAILS = register_lookup(
+    "recipient.by_emails",
+    f"SELECT {RECIPIENT_COLUMNS}, Recipient.Email AS LookupKey FROM Recipient",
+    "Recipient.Email",
+)
+RECIPIENT_BY_REQUIREMENTS = register_lookup(
+    "recipient.by_requirements",
+    f"""SELECT {RECIPIENT_COLUMNS}, Requirement.ID AS LookupKey
+FROM Requirement
+JOIN Recipient ON Recipient.ID = Requirement.Recipient AND {LIVE_REQUIREMENT}""",
+    "Requirement.ID",
+)
+FUND_BY_IDS = register_lookup(
+    "fund.by_ids",
+    f"SELECT {FUND_COLUMNS}, Fund.ID AS LookupKey FROM Fund",
+    "Fund.ID",
+)
+
+
+def volunteer_from_row(row) -> Volunteer:
+    return Volunteer(
+        id=row["ID"],
+        name=row["Name"] or "No name",
+        surname=row["Surname"] or "",
+        email=row["Email"] or "null@example.com",
+        phone=row["Phone"] or "",
+        age=row["Age"] or "",
+        available=row["Available"],
+        profile_pic=row["ProfilePic"] or "",
+    )
+
+
+def recipient_from_row(row) -> Recipient:
+    return Recipient(
+        id=row["ID"],
+        name=row["Name"],
+        email=row["Email"] or "none@example.com",
+    )
+
+
+async def lookup(db: Database, query: str, keys: list[str], build) -> dict:
+    rows = await db.fetch_all(query, {"keys": keys})
+    return {row["LookupKey"]: build(row) for row in rows}
+
+
+async def get_user_roles(db: Database) -> list[tuple[RoleEnum, str]]:
+    rows = await db.reader.fetch_all(query="SELECT Role, ID FROM UserIdentity")
+    return [(RoleEnum(r["Role"]), r["ID"]) for r in rows]
+
+
 async def get_five_last_funds(db: Database) -> list[DetailFund]:
     query = """
 SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
@@ -642,7 +1388,7 @@ FROM Fund
 ORDER BY Fund.ID DESC
 LIMIT 5
 """
-    rows = await db.connection.fetch_all(query=query)
+    rows = await db.reader.fetch_all(query=query)
     result = []
     if rows:
         for f in rows:
@@ -671,12 +1417,12 @@ LIMIT 5
 
 
 async def get_requirement(db: Database, requirement_id: str) -> RequirementWithItems:
-    query = """
+    query = f"""
 SELECT Requirement.ID, Requirement.Deadline, Requirement.Name, Requirement.Priority, Requirement.Description
 FROM Requirement
-WHERE Requirement.ID = :requirement_id
+WHERE Requirement.ID = :requirement_id AND {LIVE_REQUIREMENT}
 """
-    row = await db.connection.fetch_one(
+    row = await db.reader.fetch_one(
         query=query, values={"requirement_id": requirement_id}
     )
     if row:
@@ -710,21 +1456,38 @@ WHERE Email = :start_mail
             "available": volunteer_info.available,
         },
     )
+    await record_change(
+        db, await get_volunteer_change(db, "volunteer.updated", volunteer_info.email)
+    )
 
 
 async def update_user_profile_pic_by_email(db: Database, email: str, profile_pic: str):
-    queries = [
-        "UPDATE Recipient SET ProfilePic = :profile_pic WHERE Email = :email",
-        "UPDATE Volunteer SET ProfilePic = :profile_pic WHERE Email = :email",
-    ]
     print(f"Updating profile pic for {email} to {profile_pic}")
-    for query in queries:
-        await db.connection.execute(
-            query=query,
-            values={
-                "email": email,
-                "profile_pic": profile_pic,
-            },
+    changed = []
+    async with db.connection.transaction():
+        for table in ("Recipient", "Volunteer"):
+            rows = await db.connection.fetch_all(
+                query=f"SELECT ProfilePic FROM {table} WHERE Email = :email",
+                values={"email": email},
+            )
+            if rows:
+                changed.append(table)
+            for row in rows:
+                await move_blob_reference(db, row["ProfilePic"], profile_pic)
+            await db.connection.execute(
+                query=f"UPDATE {table} SET ProfilePic = :profile_pic WHERE Email = :email",
+                values={
+                    "email": email,
+                    "profile_pic": profile_pic,
+                },
+            )
+    if "Volunteer" in changed:
+        await record_change(
+            db, await get_volunteer_change(db, "volunteer.updated", email)
+        )
+    if "Recipient" in changed:
+        await record_change(
+            db, await get_recipient_change(db, "recipient.updated", email)
         )
 
 
@@ -748,28 +1511,200 @@ WHERE Email = :curr_email
             "available": volunteer_info.available,
         },
     )
+    await record_change(
+        db, await get_volunteer_change(db, "volunteer.updated", volunteer_info.email)
+    )
 
 
 async def update_fund_picture(db: Database, fund_id: str, picture: str):
-    query = "UPDATE Fund SET Picture = :picture WHERE ID = :fund_id"
+    await update_fund_file(db, fund_id, "Picture", picture)
+
+
+async def update_fund_report_file(db: Database, fund_id: str, report_file: str):
+    await update_fund_file(db, fund_id, "ReportFile", report_file)
+
+
+async def set_fund_file(db: Database, fund_id: str, field: str, url: str):
+    async with db.connection.transaction():
+        row = await db.connection.fetch_one(
+            query=f"SELECT {field} FROM Fund WHERE ID = :fund_id",
+            values={"fund_id": fund_id},
+        )
+        if row is None:
+            raise DatabaseException("Fund not found")
+        await move_blob_reference(db, row[field], url)
+        await update_fund_field_by_id(db, fund_id, field, url)
+
+
+async def update_fund_file(db: Database, fund_id: str, field: str, url: str):
+    await set_fund_file(db, fund_id, field, url)
+    await record_change(db, await get_fund_change(db, "fund.updated", fund_id))
+
+
+async def get_fund_report_file(db: Database, fund_id: str) -> str | None:
+    query = "SELECT ReportFile FROM Fund WHERE ID = :fund_id"
+    return await db.reader.fetch_val(query=query, values={"fund_id": fund_id})
+
+
+async def add_blob(db: Database, digest: str, size: int, content_type: str):
+    # Re-uploading a blob restarts its grace period, so it is not collected
+    # before the caller gets to reference it.
+    query = """
+INSERT INTO Blob (Digest, Size, ContentType, RefCount, UpdatedAt)
+VALUES (:digest, :size, :content_type, 0, :now)
+ON CONFLICT (Digest) DO UPDATE SET UpdatedAt = :now
+"""
     await db.connection.execute(
         query=query,
         values={
-            "fund_id": fund_id,
-            "picture": picture,
+            "digest": digest,
+            "size": size,
+            "content_type": content_type,
+            "now": time.time(),
         },
     )
 
 
+async def get_blob(db: Database, digest: str) -> Blob:
+    query = "SELECT Digest, Size, ContentType FROM Blob WHERE Digest = :digest"
+    row = await db.reader.fetch_one(query=query, values={"digest": digest})
+    if row is None:
+        raise DatabaseException("File not found")
+    return Blob(digest=row["Digest"], size=row["Size"], content_type=row["ContentType"])
+
+
+async def move_blob_reference(db: Database, old_url: str | None, new_url: str | None):
+    # Run in the transaction that changes the column holding the URL.
+    if (digest := blob_digest(new_url)) is not None:
+        await db.connection.execute(
+            query="UPDATE Blob SET RefCount = RefCount + 1 WHERE Digest = :digest",
+            values={"digest": digest},
+        )
+    if (digest := blob_digest(old_url)) is not None:
+        await db.connection.execute(
+            query="""
+UPDATE Blob SET RefCount = RefCount - 1, UpdatedAt = :now
+WHERE Digest = :digest
+""",
+            values={"digest": digest, "now": time.time()},
+        )
+
+
+async def save_blob(db: Database, file, content_type: str) -> tuple[str, int]:
+    # The row is claimed before the file is written: see collect_blobs.
+    storage = get_storage()
+    path, digest, size = await asyncio.to_thread(stage_file, file)
+    try:
+        await add_blob(db, digest, size, content_type)
+        await asyncio.to_thread(storage.put, path, digest, content_type)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return digest, size
+
+
+async def collect_blobs(db: Database, grace_seconds: float) -> int:
+    # Each row is deleted and its file removed in one transaction. An upload
+    # of the same bytes runs add_blob before writing the file, so it either
+    # refreshes UpdatedAt first and the DELETE skips the row, or waits for
+    # this transaction and then writes the file again.
+    cutoff = time.time() - grace_seconds
+    rows = await db.reader.fetch_all(
+        query="SELECT Digest FROM Blob WHERE RefCount <= 0 AND UpdatedAt < :cutoff",
+        values={"cutoff": cutoff},
+    )
+    storage = get_storage()
+    collected = 0
+    for row in rows:
+        async with db.connection.transaction():
+            deleted = await db.connection.fetch_val(
+                query="""
+DELETE FROM Blob
+WHERE Digest = :digest AND RefCount <= 0 AND UpdatedAt < :cutoff
+RETURNING Digest
+""",
+                values={"digest": row["Digest"], "cutoff": cutoff},
+            )
+            if deleted is not None:
+                await asyncio.to_thread(storage.delete, deleted)
+                collected += 1
+    return collected
+
+
+# Items of requirements deleted before the cutoff, and items whose
+# requirement row is gone altogether (requirements used to be deleted
+# outright).
+ORPHANED_ITEMS = """
+SELECT Item.ID
+FROM Item
+LEFT JOIN Requirement ON Requirement.ID = Item.Requirement
+WHERE Requirement.ID IS NULL OR Requirement.DeletedAt < :cutoff
+LIMIT :limit
+"""
+
+
+async def compact_items(db: Database, cutoff: float, limit: int) -> int:
+    # Deletes up to limit orphaned items and their reservations in one
+    # transaction. They already left the stats with their requirement.
+    async with db.connection.transaction():
+        rows = await db.connection.fetch_all(
+            query=ORPHANED_ITEMS, values={"cutoff": cutoff, "limit": limit}
+        )
+        if not rows:
+            return 0
+        placeholders, values = expand_in("item_id", [r["ID"] for r in rows])
+        await db.connection.execute(
+            query=f"DELETE FROM ItemReservation WHERE Item IN ({placeholders})",
+            values=values,
+        )
+        await db.connection.execute(
+            query=f"DELETE FROM Item WHERE ID IN ({placeholders})", values=values
+        )
+    return len(rows)
+
+
+async def compact_requirements(db: Database, cutoff: float, limit: int) -> int:
+    # Requirements go once compact_items has taken all of their items.
+    rows = await db.connection.fetch_all(
+        query="""
+DELETE FROM Requirement WHERE ID IN (
+    SELECT ID FROM Requirement
+    WHERE DeletedAt < :cutoff
+        AND NOT EXISTS (SELECT 1 FROM Item WHERE Item.Requirement = Requirement.ID)
+    LIMIT :limit
+)
+RETURNING ID
+""",
+        values={"cutoff": cutoff, "limit": limit},
+    )
+    return len(rows)
+
+
+async def compact_reports(db: Database, limit: int) -> int:
+    # Reports no fund points at any more, e.g. replaced by a newer one.
+    async with db.connection.transaction():
+        rows = await db.connection.fetch_all(
+            query="""
+DELETE FROM Report WHERE ID IN (
+    SELECT ID FROM Report
+    WHERE NOT EXISTS (SELECT 1 FROM Fund WHERE Fund.Report = Report.ID)
+    LIMIT :limit
+)
+RETURNING Rating
+""",
+            values={"limit": limit},
+        )
+        await bump_stats(db, [("reports_by_rating", r["Rating"], -1) for r in rows])
+    return len(rows)
+
+
 async def get_volunteer_by_id(db: Database, volunteer_id: str) -> Volunteer:
     query = """
 SELECT Volunteer.ID, Volunteer.Name, Volunteer.Surname, Volunteer.Email, Volunteer.Phone, Volunteer.Age, Volunteer.Available, Volunteer.ProfilePic
 FROM Volunteer
 WHERE Volunteer.ID = :volunteer_id
 """
-    row = await db.connection.fetch_one(
-        query=query, values={"volunteer_id": volunteer_id}
-    )
+    row = await db.reader.fetch_one(query=query, values={"volunteer_id": volunteer_id})
 
     if row:
         return Volunteer(
@@ -794,18 +1729,30 @@ async def create_fund(db: Database, fund: FundCreate, volunteer_mail: str) -> st
 INSERT INTO Fund (ID, Name, Description, MonoJarUrl, LongJarID, Status, Picture, Volunteer) 
 VALUES (:id, :name, :description, :mono_jar_url, :long_jar_id, :status, :picture, :volunteer_id) 
 """
-    await db.connection.execute(
-        query=query,
-        values={
-            "id": fund_id,
-            "name": fund.name,
-            "description": fund.description,
-            "mono_jar_url": fund.mono_jar_url,
-            "long_jar_id": fund.long_jar_id,
-            "status": fund.status,
-            "picture": fund.picture,
-            "volunteer_id": volunteer.id,
-        },
+    # The fund only exists if all of its reservations could be made.
+    async with db.connection.transaction():
+        await db.connection.execute(
+            query=query,
+            values={
+                "id": fund_id,
+                "name": fund.name,
+                "description": fund.description,
+                "mono_jar_url": fund.mono_jar_url,
+                "long_jar_id": fund.long_jar_id,
+                "status": fund.status,
+                "picture": fund.picture,
+                "volunteer_id": volunteer.id,
+            },
+        )
+        await move_blob_reference(db, None, fund.picture)
+        items = await reserve_items(db, fund.items, fund_id, fund.reservations)
+        await bump_stats(db, [("funds_by_status", fund.status, 1)])
+    await refresh_reserved_requirements(db, items)
+    await record_change(
+        db,
+        await get_fund_change(
+            db, "fund.created", fund_id, name=fund.name, item_ids=items
+        ),
     )
 
     return fund_id
@@ -818,8 +1765,26 @@ async def update_fund_by_id(db: Database, fund_id: str, fund_info: FundCreate):
     if fund_info.description is not None and fund_info.name != "":
         await update_fund_field_by_id(db, fund_id, "Description", fund_info.description)
 
+    if fund_info.picture is not None and fund_info.picture != "":
+        await set_fund_file(db, fund_id, "Picture", fund_info.picture)
+
     if fund_info.status != StatusEnum.none:
-        await update_fund_field_by_id(db, fund_id, "Status", fund_info.status)
+        async with db.connection.transaction():
+            row = await db.connection.fetch_one(
+                query="SELECT Status FROM Fund WHERE ID = :fund_id",
+                values={"fund_id": fund_id},
+            )
+            await update_fund_field_by_id(db, fund_id, "Status", fund_info.status)
+            if row is not None:
+                await bump_stats(
+                    db,
+                    [
+                        ("funds_by_status", row["Status"], -1),
+                        ("funds_by_status", fund_info.status, 1),
+                    ],
+                )
+
+    await record_change(db, await get_fund_change(db, "fund.updated", fund_id))
 
 
 async def update_fund_field_by_id(db: Database, fund_id: str, field: str, value: str):
@@ -837,60 +1802,384 @@ WHERE ID = :fund_id
     )
 
 
-async def update_items_with_fund(db: Database, items: list[str], fund_id: str):
-    for item in items:
-        query = "UPDATE Item SET ReservedBy = :fund_id WHERE ID = :item_id"
-        await db.connection.execute(
-            query=query,
-            values={
-                "fund_id": fund_id,
-                "item_id": item,
-            },
-        )
+STAT_BUMP = """
+INSERT INTO StatCounter (Name, Key, Value) VALUES (:name, :key, :delta)
+ON CONFLICT (Name, Key) DO UPDATE SET Value = StatCounter.Value + excluded.Value
+"""
+
+# Every counter is a GROUP BY over one column; reconcile_stats rebuilds them
+# from these queries. Deleted requirements and their items are not counted.
+STAT_SOURCES = (
+    "SELECT 'funds_by_status', COALESCE(Status, 'None'), COUNT(*) FROM Fund GROUP BY Status",
+    f"SELECT 'items_by_category', COALESCE(Category, 'None'), COUNT(*) FROM Item WHERE {LIVE_ITEM} GROUP BY Category",
+    f"SELECT 'outstanding_by_category', COALESCE(Category, 'None'), SUM(Remaining) FROM Item WHERE {LIVE_ITEM} GROUP BY Category",
+    f"SELECT 'item_quantity', 'reserved', COALESCE(SUM(Count - Remaining), 0) FROM Item WHERE {LIVE_ITEM}",
+    f"SELECT 'item_quantity', 'outstanding', COALESCE(SUM(Remaining), 0) FROM Item WHERE {LIVE_ITEM}",
+    f"SELECT 'requirements_by_priority', COALESCE(Priority, 'None'), COUNT(*) FROM Requirement WHERE {LIVE_REQUIREMENT} GROUP BY Priority",
+    "SELECT 'reports_by_rating', COALESCE(CAST(Rating AS TEXT), 'None'), COUNT(*) FROM Report GROUP BY Rating",
+)
+
+
+def stat_key(value) -> str:
+    if value is None:
+        return "None"
+    return str(getattr(value, "value", value))
+
+
+async def bump_stats(db: Database, changes: list[tuple[str, object, int]]):
+    deltas: dict[tuple[str, str], int] = {}
+    for name, key, delta in changes:
+        key = (name, stat_key(key))
+        deltas[key] = deltas.get(key, 0) + delta
+    for (name, key), delta in deltas.items():
+        if delta:
+            await db.connection.execute(
+                query=STAT_BUMP, values={"name": name, "key": key, "delta": delta}
+            )
+
+
+async def get_stats(db: Database) -> Stats:
+    stats: dict[str, dict[str, int]] = {}
+    for r in await db.reader.fetch_all("SELECT Name, Key, Value FROM StatCounter"):
+        stats.setdefault(r["Name"], {})[r["Key"]] = r["Value"]
+    return Stats(**stats)
+
+
+# Held by the process rebuilding the counters; every worker of every pod
+# runs the reconciler, and two rebuilds would insert the same keys.
+STATS_RECONCILE_LOCK = 0x5354415453
 
 
-async def get_funds_by_recipient(db: Database, recipient_id: str) -> list[Fund]:
+async def reconcile_stats(db: Database) -> int:
+    # Rebuilds every counter from the source tables and returns how many of
+    # them had drifted from the incrementally maintained values.
+    async with db.connection.transaction():
+        if db.dialect == "postgresql" and not await db.connection.fetch_val(
+            "SELECT pg_try_advisory_xact_lock(:key)", {"key": STATS_RECONCILE_LOCK}
+        ):
+            return 0
+        rows = await db.connection.fetch_all("SELECT Name, Key, Value FROM StatCounter")
+        before = {(r["Name"], r["Key"]): r["Value"] for r in rows}
+        await db.connection.execute("DELETE FROM StatCounter")
+        for source in STAT_SOURCES:
+            await db.connection.execute(
+                f"INSERT INTO StatCounter (Name, Key, Value) {source}"
+            )
+        rows = await db.connection.fetch_all("SELECT Name, Key, Value FROM StatCounter")
+    after = {(r["Name"], r["Key"]): r["Value"] for r in rows}
+    return sum(
+        before.get(key, 0) != after.get(key, 0) for key in before.keys() | after.keys()
+    )
+
+
+# Batches from several workers may arrive out of order; a timestamp only
+# ever moves forward.
+USER_ACTIVITY_UPSERT = """
+INSERT INTO UserActivity (UserID, LastLogin, LastSeen)
+VALUES (:user_id, :last_login, :last_seen)
+ON CONFLICT (UserID) DO UPDATE SET
+    LastLogin = CASE
+        WHEN UserActivity.LastLogin IS NULL OR excluded.LastLogin > UserActivity.LastLogin
+        THEN COALESCE(excluded.LastLogin, UserActivity.LastLogin)
+        ELSE UserActivity.LastLogin
+    END,
+    LastSeen = CASE
+        WHEN UserActivity.LastSeen IS NULL OR excluded.LastSeen > UserActivity.LastSeen
+        THEN COALESCE(excluded.LastSeen, UserActivity.LastSeen)
+        ELSE UserActivity.LastSeen
+    END
+"""
+
+
+async def record_user_activity(db: Database, activity: list[dict]):
+    async with db.connection.transaction():
+        await db.execute_many(USER_ACTIVITY_UPSERT, activity)
+
+
+async def record_change(db: Database, event: ChangeEvent):
+    await invalidate_dashboard_read_models(db, event)
+    db.events.publish(event)
+
+
+DASHBOARD_READ_MODEL = register(
+    "dashboard.read_model",
+    """
+SELECT Payload, Version FROM DashboardReadModel
+WHERE Role = :role AND Owner = :owner
+""",
+)
+
+
+async def get_dashboard_read_model(
+    db: Database, role: RoleEnum, owner: str
+) -> tuple[str | None, int]:
+    # A user without a row has version 0 until the first store or
+    # invalidation creates it.
+    row = await db.fetch_one(DASHBOARD_READ_MODEL, {"role": role.value, "owner": owner})
+    if row is None:
+        return None, 0
+    return row["Payload"], row["Version"]
+
+
+async def store_dashboard_read_model(
+    db: Database, role: RoleEnum, owner: str, payload: str, version: int
+):
+    # Skipped when an invalidation bumped the version while the payload was
+    # being built; the next read rebuilds it.
     query = """
-SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
+INSERT INTO DashboardReadModel (Role, Owner, Version, Payload, UpdatedAt)
+VALUES (:role, :owner, :version, :payload, CURRENT_TIMESTAMP)
+ON CONFLICT (Role, Owner) DO UPDATE
+SET Payload = excluded.Payload, UpdatedAt = excluded.UpdatedAt
+WHERE DashboardReadModel.Version = excluded.Version
+"""
+    await db.connection.execute(
+        query=query,
+        values={
+            "role": role.value,
+            "owner": owner,
+            "payload": payload,
+            "version": version,
+        },
+    )
+
+
+async def invalidate_dashboard_read_models(db: Database, event: ChangeEvent):
+    # Only the users named in the event: broadcast changes reach volunteers
+    # through the requirement feed, which is not part of the read model.
+    # Creates missing rows, so a payload built before the change cannot be
+    # stored afterwards.
+    query = """
+INSERT INTO DashboardReadModel (Role, Owner, Version) VALUES (:role, :owner, 1)
+ON CONFLICT (Role, Owner) DO UPDATE
+SET Payload = NULL, Version = DashboardReadModel.Version + 1
+"""
+    values = [
+        {"role": role.value, "owner": owner}
+        for role, owners in (
+            (RoleEnum.volunteer, event.volunteers),
+            (RoleEnum.recipient, event.recipients),
+        )
+        for owner in owners
+    ]
+    if values:
+        await db.execute_many(query, values)
+
+
+async def get_fund_change(
+    db: Database, event_type: str, fund_id: str, **data
+) -> ChangeEvent:
+    query = f"""
+SELECT Fund.Volunteer, Requirement.Recipient
 FROM Fund
-JOIN Item ON Fund.ID = Item.ReservedBy
-JOIN Requirement ON Item.Requirement = Requirement.ID
-JOIN Recipient ON Requirement.Recipient = Recipient.ID
-WHERE Recipient.ID = :recipient_id
+LEFT JOIN ItemReservation ON ItemReservation.Fund = Fund.ID
+LEFT JOIN Item ON Item.ID = ItemReservation.Item
+LEFT JOIN Requirement ON Item.Requirement = Requirement.ID AND {LIVE_REQUIREMENT}
+WHERE Fund.ID = :fund_id
+"""
+    rows = await db.connection.fetch_all(query=query, values={"fund_id": fund_id})
+    return ChangeEvent(
+        event_type,
+        {"fund_id": fund_id, **data},
+        volunteers=frozenset(r["Volunteer"] for r in rows if r["Volunteer"]),
+        recipients=frozenset(r["Recipient"] for r in rows if r["Recipient"]),
+    )
+
+
+async def get_requirement_change(
+    db: Database, event_type: str, requirement_id: str, **data
+) -> ChangeEvent:
+    # Requirements and their items show up in every volunteer's feed.
+    query = """
+SELECT Requirement.Recipient, Fund.Volunteer
+FROM Requirement
+LEFT JOIN Item ON Item.Requirement = Requirement.ID
+LEFT JOIN ItemReservation ON ItemReservation.Item = Item.ID
+LEFT JOIN Fund ON Fund.ID = ItemReservation.Fund
+WHERE Requirement.ID = :requirement_id
 """
     rows = await db.connection.fetch_all(
-        query=query, values={"recipient_id": recipient_id}
+        query=query, values={"requirement_id": requirement_id}
+    )
+    return ChangeEvent(
+        event_type,
+        {"requirement_id": requirement_id, **data},
+        volunteers=frozenset(r["Volunteer"] for r in rows if r["Volunteer"]),
+        recipients=frozenset(r["Recipient"] for r in rows if r["Recipient"]),
+        broadcast=frozenset({RoleEnum.volunteer}),
     )
 
-    if rows:
-        return [
-            Fund(
-                id=f["ID"],
-                name=f["Name"],
-                description=f["Description"],
-                mono_jar_url=f["MonoJarUrl"],
-                status=f["Status"],
-                picture=f["Picture"],
-                long_jar_id=f["LongJarID"],
-            )
-            for f in rows
-        ]
-    return []
+
+async def get_volunteer_change(
+    db: Database, event_type: str, email: str
+) -> ChangeEvent:
+    query = f"""
+SELECT Volunteer.ID, Requirement.Recipient
+FROM Volunteer
+LEFT JOIN Fund ON Fund.Volunteer = Volunteer.ID
+LEFT JOIN ItemReservation ON ItemReservation.Fund = Fund.ID
+LEFT JOIN Item ON Item.ID = ItemReservation.Item
+LEFT JOIN Requirement ON Item.Requirement = Requirement.ID AND {LIVE_REQUIREMENT}
+WHERE Volunteer.Email = :email
+"""
+    rows = await db.connection.fetch_all(query=query, values={"email": email})
+    return ChangeEvent(
+        event_type,
+        {"volunteer_id": rows[0]["ID"] if rows else None},
+        volunteers=frozenset(r["ID"] for r in rows),
+        recipients=frozenset(r["Recipient"] for r in rows if r["Recipient"]),
+    )
 
 
-async def get_funds_by_recipient(db: Database, recipient_id: str) -> list[DetailFund]:
+async def get_recipient_change(
+    db: Database, event_type: str, email: str
+) -> ChangeEvent:
+    # The recipient shows up on their own dashboard and, through reserved
+    # items, on the dashboards of the funds' volunteers.
+    query = f"""
+SELECT Recipient.ID, Fund.Volunteer
+FROM Recipient
+LEFT JOIN Requirement ON Requirement.Recipient = Recipient.ID AND {LIVE_REQUIREMENT}
+LEFT JOIN Item ON Item.Requirement = Requirement.ID
+LEFT JOIN ItemReservation ON ItemReservation.Item = Item.ID
+LEFT JOIN Fund ON Fund.ID = ItemReservation.Fund
+WHERE Recipient.Email = :email
+"""
+    rows = await db.connection.fetch_all(query=query, values={"email": email})
+    return ChangeEvent(
+        event_type,
+        {"recipient_id": rows[0]["ID"] if rows else None},
+        volunteers=frozenset(r["Volunteer"] for r in rows if r["Volunteer"]),
+        recipients=frozenset(r["ID"] for r in rows),
+    )
+
+
+RESERVE_ITEM_RETRIES = 3
+
+
+async def reserve_item(
+    db: Database, item_id: str, fund_id: str, quantity: int | None = None
+) -> int:
+    # The decrement only applies while enough stock is left, so concurrent
+    # reservations can never take more than Count. Without a quantity the
+    # fund takes whatever remains; a concurrent reservation between the read
+    # and the update makes it retry with the new remainder.
+    for _ in range(RESERVE_ITEM_RETRIES):
+        wanted = quantity
+        if wanted is None:
+            row = await db.connection.fetch_one(
+                query=f"SELECT Remaining FROM Item WHERE ID = :item_id AND {LIVE_ITEM}",
+                values={"item_id": item_id},
+            )
+            if row is None:
+                raise DatabaseException(f"Item with ID {item_id} not found")
+            if not (wanted := row["Remaining"]):
+                raise ReservationConflict(f"Item with ID {item_id} is fully reserved")
+        query = f"""
+UPDATE Item
+SET Remaining = Remaining - :quantity, ReservedBy = COALESCE(ReservedBy, :fund_id)
+WHERE ID = :item_id AND Remaining >= :quantity AND {LIVE_ITEM}
+RETURNING Category
+"""
+        row = await db.connection.fetch_one(
+            query=query,
+            values={"item_id": item_id, "fund_id": fund_id, "quantity": wanted},
+        )
+        if row is not None:
+            break
+        if quantity is not None:
+            found = await db.connection.fetch_val(
+                query=f"SELECT COUNT(*) FROM Item WHERE ID = :item_id AND {LIVE_ITEM}",
+                values={"item_id": item_id},
+            )
+            if not found:
+                raise DatabaseException(f"Item with ID {item_id} not found")
+            raise ReservationConflict(
+                f"Item with ID {item_id} has fewer than {quantity} left"
+            )
+    else:
+        raise ReservationConflict(f"Item with ID {item_id} is being reserved")
+
     query = """
-SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
-FROM Fund
-Join item on item.ReservedBy = fund.id
-join Requirement on requirement.id = item.Requirement
-where Requirement.Recipient = :recipient_id
-group by Fund.Id, Fund.Name
-limit 5
+INSERT INTO ItemReservation (Item, Fund, Quantity)
+VALUES (:item_id, :fund_id, :quantity)
+ON CONFLICT (Item, Fund)
+DO UPDATE SET Quantity = ItemReservation.Quantity + excluded.Quantity
 """
-    rows = await db.connection.fetch_all(
-        query=query, values={"recipient_id": recipient_id}
+    await db.connection.execute(
+        query=query,
+        values={"item_id": item_id, "fund_id": fund_id, "quantity": wanted},
+    )
+    await bump_stats(
+        db,
+        [
+            ("item_quantity", "reserved", wanted),
+            ("item_quantity", "outstanding", -wanted),
+            ("outstanding_by_category", row["Category"], -wanted),
+        ],
+    )
+    return wanted
+
+
+async def reserve_items(
+    db: Database,
+    items: list[str],
+    fund_id: str,
+    reservations: list[ItemReservationCreate] = [],
+) -> list[str]:
+    # Either every reservation is applied or none is; joins an open
+    # transaction. Returns the reserved item IDs.
+    async with db.connection.transaction():
+        for item in items:
+            await reserve_item(db, item, fund_id)
+        for reservation in reservations:
+            await reserve_item(db, reservation.item_id, fund_id, reservation.quantity)
+    return [*items, *(r.item_id for r in reservations)]
+
+
+async def refresh_reserved_requirements(db: Database, items: list[str]):
+    if items:
+        placeholders, values = expand_in("item_id", items)
+        await refresh_urgent_requirements(
+            db,
+            f"Requirement.ID IN (SELECT Requirement FROM Item WHERE ID IN ({placeholders}))",
+            values,
+        )
+
+
+async def update_items_with_fund(
+    db: Database,
+    items: list[str],
+    fund_id: str,
+    reservations: list[ItemReservationCreate] = [],
+):
+    items = await reserve_items(db, items, fund_id, reservations)
+    await refresh_reserved_requirements(db, items)
+    await record_change(
+        db, await get_fund_change(db, "fund.items_reserved", fund_id, item_ids=items)
     )
+
+
+# Grouping by the primary key is enough for Postgres to accept the other
+# Fund columns in the select list.
+FUND_BY_RECIPIENT = register(
+    "fund.by_recipient",
+    f"""
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID
+FROM Fund
+JOIN ItemReservation ON ItemReservation.Fund = Fund.ID
+JOIN Item ON Item.ID = ItemReservation.Item
+JOIN Requirement ON Requirement.ID = Item.Requirement
+WHERE Requirement.Recipient = :recipient_id AND {LIVE_REQUIREMENT}
+GROUP BY Fund.ID
+ORDER BY Fund.ID
+LIMIT 5
+""",
+)
+
+
+async def get_funds_by_recipient(db: Database, recipient_id: str) -> list[DetailFund]:
+    rows = await db.fetch_all(FUND_BY_RECIPIENT, {"recipient_id": recipient_id})
     result = []
     if rows:
         for f in rows:
@@ -932,51 +2221,376 @@ VALUES (:id, :rating, :final_conclution)
             "final_conclution": report.final_conclution,
         },
     )
+    await bump_stats(db, [("reports_by_rating", report.rating, 1)])
     return report_id
 
 
 async def add_report_by_fund_id(db: Database, fund_id: str, report: ReportBase):
-    query = """
+    # One transaction, so compaction never sees the new report before the
+    # fund points at it.
+    async with db.connection.transaction():
+        query = """
 INSERT INTO Report (ID, Rating, FinalConclution)
 VALUES (:id, :rating, :final_conclution)
 """
-    report_id = str(uuid.uuid4())
+        report_id = str(uuid.uuid4())
+        await db.connection.execute(
+            query=query,
+            values={
+                "id": report_id,
+                "rating": report.rating,
+                "final_conclution": report.final_conclution,
+            },
+        )
+        await bump_stats(db, [("reports_by_rating", report.rating, 1)])
+        query = """
+UPDATE Fund
+SET Report = :report_id
+WHERE ID = :fund_id
+"""
+        await db.connection.execute(
+            query=query,
+            values={
+                "report_id": report_id,
+                "fund_id": fund_id,
+            },
+        )
+        query = """
+INSERT INTO ReportSearch (Fund, Conclusion) VALUES (:fund_id, :conclusion)
+ON CONFLICT (Fund) DO UPDATE SET Conclusion = :conclusion
+"""
+        await db.connection.execute(
+            query=query,
+            values={"fund_id": fund_id, "conclusion": report.final_conclution},
+        )
+    await record_change(
+        db, await get_fund_change(db, "fund.report_added", fund_id, report_id=report_id)
+    )
+
+
+REPORT_CLAIM_SECONDS = float(os.getenv("REPORT_CLAIM_SECONDS", 900))
+# A document whose processing crashed this many times is marked Failed
+# instead of being claimed again.
+REPORT_MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", 3))
+
+
+async def queue_report_document(db: Database, fund_id: str, digest: str):
+    query = """
+INSERT INTO ReportDocument (Fund, Digest, Status, UpdatedAt)
+VALUES (:fund_id, :digest, 'Pending', :now)
+ON CONFLICT (Fund) DO UPDATE SET Digest = :digest, Status = 'Pending', Error = NULL, Attempts = 0, UpdatedAt = :now
+"""
     await db.connection.execute(
         query=query,
+        values={"fund_id": fund_id, "digest": digest, "now": time.time()},
+    )
+
+
+async def claim_report_document(db: Database) -> tuple[str, str] | None:
+    # Takes the oldest pending document, or one whose worker died more than
+    # REPORT_CLAIM_SECONDS ago. The conditional update makes the claim
+    # exclusive across workers and pods.
+    now = time.time()
+    await db.connection.execute(
+        query="""
+UPDATE ReportDocument SET Status = 'Failed', Error = 'Processing failed', UpdatedAt = :now
+WHERE Status = 'Processing' AND UpdatedAt < :stale AND Attempts >= :max_attempts
+""",
         values={
-            "id": report_id,
-            "rating": report.rating,
-            "final_conclution": report.final_conclution,
+            "now": now,
+            "stale": now - REPORT_CLAIM_SECONDS,
+            "max_attempts": REPORT_MAX_ATTEMPTS,
         },
     )
+    row = await db.connection.fetch_one(
+        query="""
+UPDATE ReportDocument SET Status = 'Processing', Attempts = Attempts + 1, UpdatedAt = :now
+WHERE Fund = (
+    SELECT Fund FROM ReportDocument
+    WHERE Status = 'Pending' OR (Status = 'Processing' AND UpdatedAt < :stale)
+    ORDER BY UpdatedAt
+    LIMIT 1
+)
+AND (Status = 'Pending' OR (Status = 'Processing' AND UpdatedAt < :stale))
+RETURNING Fund, Digest
+""",
+        values={"now": now, "stale": now - REPORT_CLAIM_SECONDS},
+    )
+    return (row["Fund"], row["Digest"]) if row else None
+
+
+async def finish_report_document(
+    db: Database,
+    fund_id: str,
+    digest: str,
+    pages: int,
+    text: str,
+    preview: str | None,
+):
+    async with db.connection.transaction():
+        row = await db.connection.fetch_one(
+            query="""
+SELECT Preview FROM ReportDocument
+WHERE Fund = :fund_id AND Digest = :digest AND Status = 'Processing'
+""",
+            values={"fund_id": fund_id, "digest": digest},
+        )
+        if row is None:
+            # A newer PDF was uploaded meanwhile.
+            return
+        await move_blob_reference(db, row["Preview"], preview)
+        await db.connection.execute(
+            query="""
+UPDATE ReportDocument
+SET Status = 'Done', Pages = :pages, Preview = :preview, Error = NULL, UpdatedAt = :now
+WHERE Fund = :fund_id
+""",
+            values={
+                "fund_id": fund_id,
+                "pages": pages,
+                "preview": preview,
+                "now": time.time(),
+            },
+        )
+        await db.connection.execute(
+            query="""
+INSERT INTO ReportSearch (Fund, Body) VALUES (:fund_id, :text)
+ON CONFLICT (Fund) DO UPDATE SET Body = :text
+""",
+            values={"fund_id": fund_id, "text": text},
+        )
+    await record_change(
+        db, await get_fund_change(db, "fund.report_processed", fund_id, pages=pages)
+    )
+
+
+async def fail_report_document(db: Database, fund_id: str, digest: str, error: str):
     query = """
-UPDATE Fund
-SET Report = :report_id
-WHERE ID = :fund_id
+UPDATE ReportDocument SET Status = 'Failed', Error = :error, UpdatedAt = :now
+WHERE Fund = :fund_id AND Digest = :digest AND Status = 'Processing'
+"""
+    await db.connection.execute(
+        query=query,
+        values={
+            "fund_id": fund_id,
+            "digest": digest,
+            "error": error,
+            "now": time.time(),
+        },
+    )
+
+
+async def retry_report_document(db: Database, fund_id: str, digest: str):
+    # Back in the queue, unless it already used up its attempts.
+    query = """
+UPDATE ReportDocument
+SET Status = CASE WHEN Attempts < :max_attempts THEN 'Pending' ELSE 'Failed' END,
+    Error = CASE WHEN Attempts < :max_attempts THEN NULL ELSE 'Processing failed' END,
+    UpdatedAt = :now
+WHERE Fund = :fund_id AND Digest = :digest AND Status = 'Processing'
 """
     await db.connection.execute(
         query=query,
         values={
-            "report_id": report_id,
             "fund_id": fund_id,
+            "digest": digest,
+            "max_attempts": REPORT_MAX_ATTEMPTS,
+            "now": time.time(),
         },
     )
 
 
+async def get_report_document(db: Database, fund_id: str) -> ReportDocument | None:
+    query = """
+SELECT Status, Pages, Preview, Error FROM ReportDocument WHERE Fund = :fund_id
+"""
+    row = await db.reader.fetch_one(query=query, values={"fund_id": fund_id})
+    if row is None:
+        return None
+    return ReportDocument(
+        status=row["Status"],
+        pages=row["Pages"],
+        preview=row["Preview"],
+        error=row["Error"],
+    )
+
+
+REPORT_SEARCH = register(
+    "report.search",
+    """
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID,
+    snippet(ReportSearchIndex, -1, '[', ']', '...', 24) AS Snippet,
+    ReportDocument.Pages, ReportDocument.Preview
+FROM ReportSearchIndex
+JOIN ReportSearch ON ReportSearch.rowid = ReportSearchIndex.rowid
+JOIN Fund ON Fund.ID = ReportSearch.Fund
+LEFT JOIN ReportDocument ON ReportDocument.Fund = Fund.ID
+WHERE ReportSearchIndex MATCH :terms
+ORDER BY ReportSearchIndex.rank
+LIMIT :limit
+""",
+    """
+SELECT Fund.ID, Fund.Name, Fund.Description, Fund.MonoJarUrl, Fund.Status, Fund.Picture, Fund.LongJarID,
+    ts_headline(
+        'simple',
+        coalesce(ReportSearch.Conclusion, '') || ' ' || coalesce(ReportSearch.Body, ''),
+        plainto_tsquery('simple', :terms),
+        'StartSel=[, StopSel=], MaxWords=24, MinWords=8'
+    ) AS Snippet,
+    ReportDocument.Pages, ReportDocument.Preview
+FROM ReportSearch
+JOIN Fund ON Fund.ID = ReportSearch.Fund
+LEFT JOIN ReportDocument ON ReportDocument.Fund = Fund.ID
+WHERE ReportSearch.Document @@ plainto_tsquery('simple', :terms)
+ORDER BY ts_rank(ReportSearch.Document, plainto_tsquery('simple', :terms)) DESC
+LIMIT :limit
+""",
+)
+
+
+def search_terms(query: str) -> str:
+    # Every word as a quoted FTS5 phrase, so user input can't be read as
+    # query syntax; plainto_tsquery ignores the quotes.
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+async def search_reports(
+    db: Database, query: str, limit: int
+) -> list[ReportSearchResult]:
+    if not (terms := search_terms(query)):
+        return []
+    rows = await db.fetch_all(REPORT_SEARCH, {"terms": terms, "limit": limit})
+    return [
+        ReportSearchResult(
+            fund=fund_record(r),
+            snippet=r["Snippet"] or "",
+            pages=r["Pages"],
+            preview=r["Preview"],
+        )
+        for r in rows
+    ]
+
+
 async def update_requirement_by_id(
     db: Database, requirement_id: str, requirement_info: RequirementBase
 ):
-    for field, value in requirement_info.model_dump().items():
-        if value is not None:
-            query = f""" 
+    async with db.connection.transaction():
+        if requirement_info.priority is not None:
+            row = await db.connection.fetch_one(
+                query=f"SELECT Priority FROM Requirement WHERE ID = :requirement_id AND {LIVE_REQUIREMENT}",
+                values={"requirement_id": requirement_id},
+            )
+            if row is not None:
+                await bump_stats(
+                    db,
+                    [
+                        ("requirements_by_priority", row["Priority"], -1),
+                        ("requirements_by_priority", requirement_info.priority, 1),
+                    ],
+                )
+        for field, value in requirement_info.model_dump().items():
+            if value is not None:
+                query = f"""
 UPDATE Requirement
 SET {field} = :value
-WHERE ID = :requirement_id
+WHERE ID = :requirement_id AND {LIVE_REQUIREMENT}
 """
-            await db.connection.execute(
-                query=query,
-                values={
-                    "requirement_id": requirement_id,
-                    "value": value,
-                },
-            )
+                await db.connection.execute(
+                    query=query,
+                    values={
+                        "requirement_id": requirement_id,
+                        "value": value,
+                    },
+                )
+    await refresh_urgent_requirements(
+        db, "Requirement.ID = :id", {"id": requirement_id}
+    )
+    await record_change(
+        db, await get_requirement_change(db, "requirement.updated", requirement_id)
+    )
+
+
+EXPORT_DATASETS: dict[str, tuple[list[tuple[str, str]], str]] = {
+    "funds": (
+        [
+            ("fund_id", "Fund.ID"),
+            ("name", "Fund.Name"),
+            ("description", "Fund.Description"),
+            ("status", "Fund.Status"),
+            ("mono_jar_url", "Fund.MonoJarUrl"),
+            ("long_jar_id", "Fund.LongJarID"),
+            ("picture", "Fund.Picture"),
+            ("volunteer_id", "Volunteer.ID"),
+            ("volunteer_name", "Volunteer.Name"),
+            ("volunteer_surname", "Volunteer.Surname"),
+            ("report_id", "Report.ID"),
+            ("report_rating", "Report.Rating"),
+            ("report_final_conclution", "Report.FinalConclution"),
+        ],
+        """
+FROM Fund
+LEFT JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
+LEFT JOIN Report ON Fund.Report = Report.ID
+ORDER BY Fund.ID
+""",
+    ),
+    "requirements": (
+        [
+            ("requirement_id", "Requirement.ID"),
+            ("name", "Requirement.Name"),
+            ("deadline", "Requirement.Deadline"),
+            ("priority", "Requirement.Priority"),
+            ("description", "Requirement.Description"),
+            ("recipient_id", "Recipient.ID"),
+            ("recipient_name", "Recipient.Name"),
+            ("item_id", "Item.ID"),
+            ("item_name", "Item.Name"),
+            ("item_count", "Item.Count"),
+            ("item_category", "Item.Category"),
+            ("item_reserved_by", "Item.ReservedBy"),
+        ],
+        f"""
+FROM Requirement
+LEFT JOIN Recipient ON Requirement.Recipient = Recipient.ID
+LEFT JOIN Item ON Item.Requirement = Requirement.ID
+WHERE {LIVE_REQUIREMENT}
+ORDER BY Requirement.ID, Item.ID
+""",
+    ),
+    "reports": (
+        [
+            ("report_id", "Report.ID"),
+            ("rating", "Report.Rating"),
+            ("final_conclution", "Report.FinalConclution"),
+            ("fund_id", "Fund.ID"),
+            ("fund_name", "Fund.Name"),
+            ("fund_status", "Fund.Status"),
+            ("volunteer_id", "Volunteer.ID"),
+            ("volunteer_name", "Volunteer.Name"),
+            ("volunteer_surname", "Volunteer.Surname"),
+        ],
+        """
+FROM Report
+JOIN Fund ON Fund.Report = Report.ID
+LEFT JOIN Volunteer ON Fund.Volunteer = Volunteer.ID
+ORDER BY Report.ID
+""",
+    ),
+}
+
+
+def get_export_columns(dataset: str) -> list[str]:
+    return [name for name, _ in EXPORT_DATASETS[dataset][0]]
+
+
+async def iterate_export_rows(db: Database, dataset: str):
+    # Rows are pulled one at a time from a cursor (a server-side one on
+    # Postgres), so memory does not grow with the table.
+    columns, source = EXPORT_DATASETS[dataset]
+    query = (
+        "SELECT "
+        + ", ".join(f"{column} AS {name}" for name, column in columns)
+        + source
+    )
+    async for row in db.reader.iterate(query=query):
+        yield [row[name] for name, _ in columns]
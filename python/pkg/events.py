@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+from pkg.models import RoleEnum
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+EVENT_RELAY_CHANNEL = "change_events"
+EVENT_RELAY_PING_SECONDS = float(os.getenv("EVENT_RELAY_PING_SECONDS", 30))
+EVENT_RELAY_RETRY_SECONDS = float(os.getenv("EVENT_RELAY_RETRY_SECONDS", 5))
+# NOTIFY payloads must stay under 8000 bytes.
+EVENT_RELAY_PAYLOAD_LIMIT = 7900
+
+
+@dataclass(slots=True, frozen=True)
+class ChangeEvent:
+    type: str
+    data: dict
+    volunteers: frozenset[str] = frozenset()
+    recipients: frozenset[str] = frozenset()
+    # Roles that receive the event whatever their ID, e.g. new requirements
+    # are interesting to every volunteer.
+    broadcast: frozenset[RoleEnum] = frozenset()
+
+
+class Subscription:
+    __slots__ = ("role", "user_id", "queue", "overflowed")
+
+    def __init__(self, role: RoleEnum, user_id: str, queue_size: int):
+        self.role = role
+        self.user_id = user_id
+        self.queue: asyncio.Queue[ChangeEvent] = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, event: ChangeEvent):
+        # A slow client never holds more than queue_size events: the oldest
+        # one is dropped and the client is told to resync instead.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflowed = True
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._by_user: dict[tuple[RoleEnum, str], set[Subscription]] = {}
+        self._by_role: dict[RoleEnum, set[Subscription]] = {}
+        self._listeners: list[Callable[[ChangeEvent], None]] = []
+        self._remote_listeners: list[Callable[[ChangeEvent], None]] = []
+        self.relay: PostgresEventRelay | None = None
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._by_user)
+
+    def add_listener(self, listener: Callable[[ChangeEvent], None]):
+        # Listeners are called synchronously on every event and must not block.
+        self._listeners.append(listener)
+
+    def add_remote_listener(self, listener: Callable[[ChangeEvent], None]):
+        # Called for events published by other processes; listeners added
+        # with add_listener have already handled those where they happened.
+        self._remote_listeners.append(listener)
+
+    def subscribe(self, role: RoleEnum, user_id: str) -> Subscription:
+        subscription = Subscription(role, user_id, self.queue_size)
+        self._by_user.setdefault((role, user_id), set()).add(subscription)
+        self._by_role.setdefault(role, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        key = (subscription.role, subscription.user_id)
+        for index, index_key in ((self._by_user, key), (self._by_role, key[0])):
+            subscriptions = index.get(index_key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del index[index_key]
+
+    def publish(self, event: ChangeEvent):
+        for listener in self._listeners:
+            listener(event)
+        self.deliver(event)
+        if self.relay is not None:
+            self.relay.send(event)
+
+    def receive(self, event: ChangeEvent, resync: bool = False):
+        for listener in self._remote_listeners:
+            listener(event)
+        self.deliver(event, resync)
+
+    def deliver(self, event: ChangeEvent, resync: bool = False):
+        targets: set[Subscription] = set()
+        for role in event.broadcast:
+            targets |= self._by_role.get(role, set())
+        for role, ids in (
+            (RoleEnum.volunteer, event.volunteers),
+            (RoleEnum.recipient, event.recipients),
+        ):
+            if role in event.broadcast:
+                continue
+            for user_id in ids:
+                targets |= self._by_user.get((role, user_id), set())
+        for subscription in targets:
+            subscription.push(event)
+            if resync:
+                subscription.overflowed = True
+
+
+class PostgresEventRelay:
+    # Forwards events to every other process connected to the same database
+    # (the other workers of this pod and the other pods) over LISTEN/NOTIFY,
+    # so an SSE client sees changes whichever process made them. Delivery is
+    # best effort: events sent while the connection is down are lost.
+    def __init__(self, hub: EventHub, url: str):
+        self.hub = hub
+        self.url = url
+        self.origin = uuid.uuid4().hex
+        self._outbox: asyncio.Queue[str] = asyncio.Queue(hub.queue_size)
+        hub.relay = self
+
+    def send(self, event: ChangeEvent):
+        if self._outbox.full():
+            self._outbox.get_nowait()
+            logging.warning("Event relay is behind, dropped an event")
+        self._outbox.put_nowait(self.encode(event))
+
+    def encode(self, event: ChangeEvent) -> str:
+        payload = {
+            "origin": self.origin,
+            "type": event.type,
+            "data": event.data,
+            "volunteers": sorted(event.volunteers),
+            "recipients": sorted(event.recipients),
+            "broadcast": sorted(role.value for role in event.broadcast),
+        }
+        text = json.dumps(payload, ensure_ascii=False, default=str)
+        if len(text.encode()) <= EVENT_RELAY_PAYLOAD_LIMIT:
+            return text
+        # Too large to relay: every remote subscriber is told to resync.
+        return json.dumps(
+            payload
+            | {
+                "data": {},
+                "volunteers": [],
+                "recipients": [],
+                "broadcast": [RoleEnum.volunteer.value, RoleEnum.recipient.value],
+                "resync": True,
+            }
+        )
+
+    def _receive(self, connection, pid: int, channel: str, text: str):
+        payload = json.loads(text)
+        if payload["origin"] == self.origin:
+            return
+        event = ChangeEvent(
+            payload["type"],
+            payload["data"],
+            volunteers=frozenset(payload["volunteers"]),
+            recipients=frozenset(payload["recipients"]),
+            broadcast=frozenset(RoleEnum(role) for role in payload["broadcast"]),
+        )
+        self.hub.receive(event, payload.get("resync", False))
+
+    async def run(self):
+        import asyncpg
+
+        while True:
+            try:
+                connection = await asyncpg.connect(self.url)
+                try:
+                    await connection.add_listener(EVENT_RELAY_CHANNEL, self._receive)
+                    while True:
+                        try:
+                            text = await asyncio.wait_for(
+                                self._outbox.get(), EVENT_RELAY_PING_SECONDS
+                            )
+                        except TimeoutError:
+                            # Notices a dropped connection while idle.
+                            await connection.execute("SELECT 1")
+                            continue
+                        await connection.execute(
+                            "SELECT pg_notify($1, $2)", EVENT_RELAY_CHANNEL, text
+                        )
+                finally:
+                    await connection.close(timeout=EVENT_RELAY_RETRY_SECONDS)
+            except Exception:
+                logging.exception("Event relay failed, reconnecting")
+                await asyncio.sleep(EVENT_RELAY_RETRY_SECONDS)
@@ -0,0 +1,278 @@
+import codecs
+import csv
+import os
+import uuid
+from collections import deque
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from pkg.database import (
+    Database,
+    insert_requirements_and_items,
+    item_insert_values,
+    requirement_insert_values,
+)
+from pkg.models import ImportReport, ImportRowError, ItemBase, RequirementImport
+
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", 1000))
+IMPORT_MAX_LINE_LENGTH = int(os.getenv("IMPORT_MAX_LINE_LENGTH", 1024 * 1024))
+IMPORT_MAX_RECORD_LINES = int(os.getenv("IMPORT_MAX_RECORD_LINES", 100))
+
+CSV_REQUIREMENT_FIELDS = ("ref", "name", "deadline", "priority", "description")
+CSV_ITEM_FIELDS = {
+    "item_name": "name",
+    "item_count": "count",
+    "item_category": "category",
+}
+
+
+class ImportLineTooLong(ValueError):
+    pass
+
+
+async def iterate_lines(
+    chunks: AsyncIterator[bytes], max_length: int = IMPORT_MAX_LINE_LENGTH
+) -> AsyncIterator[str]:
+    # Only the new chunk is split, and the start of a line that spans
+    # chunks is kept in pieces, so long lines cost no more than short ones.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending: list[str] = []
+    pending_length = 0
+    async for chunk in chunks:
+        *lines, rest = decoder.decode(chunk).split("\n")
+        for line in lines:
+            if pending:
+                line = "".join(pending) + line
+                pending, pending_length = [], 0
+            if len(line) > max_length:
+                raise ImportLineTooLong(f"Line longer than {max_length} characters")
+            yield line.rstrip("\r")
+        pending.append(rest)
+        pending_length += len(rest)
+        if pending_length > max_length:
+            raise ImportLineTooLong(f"Line longer than {max_length} characters")
+    line = "".join(pending) + decoder.decode(b"", final=True)
+    if line:
+        yield line.rstrip("\r")
+
+
+def _error_text(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}"
+            for e in error.errors()
+        )
+    return str(error)
+
+
+async def parse_ndjson(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, RequirementImport | Exception]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, RequirementImport.model_validate_json(line)
+        except ValidationError as e:
+            yield line_no, e
+
+
+class LineFeed:
+    # The input of one csv.reader for the whole upload. Lines arrive
+    # asynchronously, so parse_csv queues all lines of a record before it
+    # asks the reader for the row.
+    def __init__(self):
+        self.lines: deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def _ends_quoted(line: str, quoted: bool) -> bool:
+    # Whether a record is still inside a quoted value after this line. Follows
+    # the default csv dialect: a quote opens a value only at the start of a
+    # field, "" inside it is a literal quote, and quotes elsewhere are text.
+    if '"' not in line:
+        return quoted
+    state = "quoted" if quoted else "start"
+    for char in line:
+        if state == "quoted":
+            if char == '"':
+                state = "closing"
+        elif state == "closing":
+            state = "quoted" if char == '"' else "start" if char == "," else "field"
+        elif char == ",":
+            state = "start"
+        elif state == "start" and char == '"':
+            state = "quoted"
+        else:
+            state = "field"
+    return state == "quoted"
+
+
+async def parse_csv(
+    lines: AsyncIterator[str], max_record_lines: int = IMPORT_MAX_RECORD_LINES
+) -> AsyncIterator[tuple[int, RequirementImport | Exception]]:
+    # One row per item. Rows sharing a ref belong to the same requirement;
+    # a row without item_name creates a requirement with no items. Quoted
+    # values may span up to max_record_lines lines; rows are numbered by
+    # their first line.
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    header: list[str] | None = None
+    line_no = start = 0
+    quoted = False
+    async for line in lines:
+        line_no += 1
+        if not feed.lines:
+            if not line.strip():
+                continue
+            start = line_no
+        feed.lines.append(line + "\n")
+        quoted = _ends_quoted(line, quoted)
+        if quoted:
+            if len(feed.lines) < max_record_lines:
+                continue
+            # Give up on the record and read on from the next line.
+            feed.lines.clear()
+            quoted = False
+            yield (
+                start,
+                ValueError(f"Quoted value spans more than {max_record_lines} lines"),
+            )
+            continue
+        try:
+            values = next(reader)
+        except csv.Error as e:
+            feed.lines.clear()
+            yield start, e
+            continue
+        if header is None:
+            header = [column.strip().lower() for column in values]
+            continue
+        yield start, csv_requirement(header, values)
+    if feed.lines:
+        yield start, ValueError("Unterminated quoted value")
+
+
+def csv_requirement(
+    header: list[str], values: list[str]
+) -> RequirementImport | ValidationError:
+    row = {k: v for k, v in zip(header, values) if v != ""}
+    try:
+        items = (
+            [
+                ItemBase(
+                    **{
+                        field: row[column]
+                        for column, field in CSV_ITEM_FIELDS.items()
+                        if column in row
+                    }
+                )
+            ]
+            if "item_name" in row
+            else []
+        )
+        return RequirementImport(
+            **{k: row[k] for k in CSV_REQUIREMENT_FIELDS if k in row},
+            items=items,
+        )
+    except ValidationError as e:
+        return e
+
+
+class RequirementImporter:
+    def __init__(self, db: Database, recipient_id: str):
+        self.db = db
+        self.recipient_id = recipient_id
+        self.report = ImportReport()
+        self.refs: dict[str, str] = {}
+        self.failed_refs: set[str] = set()
+        # (line, ref, requirement values or None when the ref already exists,
+        #  item values)
+        self.pending: list[tuple[int, str | None, dict | None, list[dict]]] = []
+        self.pending_rows = 0
+
+    async def add(self, line: int, row: RequirementImport | Exception):
+        if isinstance(row, Exception):
+            self._fail(line, row)
+            return
+
+        if row.ref is not None and row.ref in self.failed_refs:
+            self._fail(line, f"requirement with ref {row.ref!r} was not imported")
+            return
+
+        requirement = None
+        requirement_id = self.refs.get(row.ref) if row.ref is not None else None
+        if requirement_id is None:
+            if not row.name:
+                self._fail(line, "name: Field required")
+                return
+            requirement_id = str(uuid.uuid4())
+            requirement = requirement_insert_values(
+                requirement_id, row, self.recipient_id
+            )
+            if row.ref is not None:
+                self.refs[row.ref] = requirement_id
+
+        items = [item_insert_values(item, requirement_id) for item in row.items]
+        self.pending.append((line, row.ref, requirement, items))
+        self.pending_rows += 1 + len(items)
+        if self.pending_rows >= IMPORT_BATCH_ROWS:
+            await self.flush()
+
+    async def flush(self):
+        pending, self.pending, self.pending_rows = self.pending, [], 0
+        if not pending:
+            return
+        requirements = [r for _, _, r, _ in pending if r is not None]
+        items = [i for _, _, _, row_items in pending for i in row_items]
+        try:
+            await insert_requirements_and_items(self.db, requirements, items)
+        except Exception:
+            # The batch was rolled back; replay it row by row so that only
+            # the offending rows are reported.
+            for entry in pending:
+                await self._insert_row(*entry)
+            return
+        self.report.requirements_created += len(requirements)
+        self.report.items_created += len(items)
+
+    async def finish(self) -> ImportReport:
+        await self.flush()
+        return self.report
+
+    async def _insert_row(
+        self, line: int, ref: str | None, requirement: dict | None, items: list[dict]
+    ):
+        if ref is not None and ref in self.failed_refs:
+            self._fail(line, f"requirement with ref {ref!r} was not imported")
+            return
+        try:
+            await insert_requirements_and_items(
+                self.db, [requirement] if requirement else [], items
+            )
+        except Exception as e:
+            if requirement is not None and ref is not None:
+                self.failed_refs.add(ref)
+                self.refs.pop(ref, None)
+            self._fail(line, e)
+            return
+        self.report.requirements_created += 1 if requirement else 0
+        self.report.items_created += len(items)
+
+    def _fail(self, line: int, error: Exception | str):
+        self.report.errors.append(
+            ImportRowError(
+                line=line,
+                error=error if isinstance(error, str) else _error_text(error),
+            )
+        )
@@ -0,0 +1,221 @@
+import asyncio
+import os
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from typing import Generic, TypeVar
+
+from fastapi import Request
+
+from pkg.database import (
+    FUND_BY_IDS,
+    RECIPIENT_BY_EMAILS,
+    RECIPIENT_BY_IDS,
+    RECIPIENT_BY_REQUIREMENTS,
+    VOLUNTEER_BY_EMAILS,
+    VOLUNTEER_BY_FUNDS,
+    VOLUNTEER_BY_IDS,
+    Database,
+    DatabaseException,
+    get_requirement_by_fund,
+    get_requirements_by_ids,
+    lookup,
+    recipient_from_row,
+    volunteer_from_row,
+)
+from pkg.models import Recipient, RequirementWithItems, Volunteer
+from pkg.records import FundRecord, RequirementRecord, fund_record
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Reads one request may run at the same time, each on its own pooled
+# connection; keeps a single request from draining the pool.
+REQUEST_DB_CONCURRENCY = int(os.getenv("REQUEST_DB_CONCURRENCY", 4))
+
+
+class Loader(Generic[K, V]):
+    # Memoizes lookups for as long as the loader lives and sends the keys
+    # asked for during one event loop iteration to batch as one query.
+    # Callers share the loaded values, so they must not change them.
+    def __init__(self, batch: Callable[[list[K]], Awaitable[dict[K, V]]], missing: str):
+        self.batch = batch
+        self.missing = missing
+        self.futures: dict[K, asyncio.Future[V]] = {}
+        self.pending: list[K] = []
+        self.tasks: set[asyncio.Task] = set()
+
+    def future(self, key: K) -> asyncio.Future[V]:
+        if (future := self.futures.get(key)) is None:
+            loop = asyncio.get_running_loop()
+            future = self.futures[key] = loop.create_future()
+            if not self.pending:
+                loop.call_soon(self.dispatch)
+            self.pending.append(key)
+        return future
+
+    async def load(self, key: K) -> V:
+        # Shielded so a cancelled caller does not cancel the lookup for the
+        # others waiting on it.
+        return await asyncio.shield(self.future(key))
+
+    async def load_many(self, keys: Iterable[K]) -> list[V]:
+        return await asyncio.shield(asyncio.gather(*map(self.future, keys)))
+
+    async def load_or_none(self, key: K) -> V | None:
+        try:
+            return await self.load(key)
+        except DatabaseException:
+            return None
+
+    def prime(self, key: K, value: V):
+        if key not in self.futures:
+            future = self.futures[key] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def dispatch(self):
+        keys, self.pending = self.pending, []
+        task = asyncio.create_task(self.resolve(keys))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def resolve(self, keys: list[K]):
+        try:
+            values = await self.batch(keys)
+        except BaseException as e:
+            # Failures are not memoized; the next load asks again.
+            for key in keys:
+                future = self.futures.pop(key)
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                elif not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key in keys:
+            future = self.futures[key]
+            if future.done():
+                continue
+            if key in values:
+                future.set_result(values[key])
+            else:
+                future.set_exception(DatabaseException(self.missing))
+
+
+class Loaders:
+    # Lookups by ID and email for one request. Volunteers and recipients
+    # found through any key are shared with the other loaders of their kind.
+    def __init__(self, db: Database):
+        self.db = db
+        self.slots = asyncio.Semaphore(REQUEST_DB_CONCURRENCY)
+        self.volunteers = Loader(self.volunteers_by_ids, "Volunteer not found")
+        self.volunteers_by_email = Loader(
+            self.volunteers_by_emails, "Volunteer not found"
+        )
+        self.volunteers_by_fund = Loader(
+            self.volunteers_by_funds, "Volunteer not found"
+        )
+        self.recipients = Loader(self.recipients_by_ids, "Recipient not found")
+        self.recipients_by_email = Loader(
+            self.recipients_by_emails, "Recipient not found"
+        )
+        self.recipients_by_requirement = Loader(
+            self.recipients_by_requirements, "Recipient not found"
+        )
+        self.requirements = Loader(self.requirements_by_ids, "Requirement not found")
+        self.funds = Loader(self.funds_by_ids, "Fund not found")
+
+    async def gather(self, *reads: Awaitable) -> list:
+        # Runs independent reads concurrently. databases hands every task its
+        # own pooled connection, so the request takes about as long as its
+        # slowest read. Every read finishes before the first failure, in
+        # argument order, is raised. The reads must not call gather again.
+        async def limited(read: Awaitable):
+            async with self.slots:
+                return await read
+
+        results = await asyncio.gather(*map(limited, reads), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def fund_requirement(self, fund_id: str) -> RequirementWithItems:
+        requirement = await get_requirement_by_fund(self.db, fund_id)
+        requirement.recipient = await self.recipients_by_requirement.load(
+            requirement.id
+        )
+        return requirement
+
+    async def fund_requirement_or_none(
+        self, fund_id: str
+    ) -> RequirementWithItems | None:
+        try:
+            return await self.fund_requirement(fund_id)
+        except DatabaseException:
+            return None
+
+    async def volunteers_by_ids(self, keys: list[str]) -> dict[str, Volunteer]:
+        return self.share_volunteers(
+            await lookup(self.db, VOLUNTEER_BY_IDS, keys, volunteer_from_row)
+        )
+
+    async def volunteers_by_emails(self, keys: list[str]) -> dict[str, Volunteer]:
+        return self.share_volunteers(
+            await lookup(self.db, VOLUNTEER_BY_EMAILS, keys, volunteer_from_row)
+        )
+
+    async def volunteers_by_funds(self, keys: list[str]) -> dict[str, Volunteer]:
+        return self.share_volunteers(
+            await lookup(self.db, VOLUNTEER_BY_FUNDS, keys, volunteer_from_row)
+        )
+
+    def share_volunteers(self, found: dict[str, Volunteer]) -> dict[str, Volunteer]:
+        # Keeps one object per volunteer, whichever key found it first.
+        shared = {}
+        for key, volunteer in found.items():
+            if (known := self.volunteers.futures.get(volunteer.id)) and known.done():
+                volunteer = known.result()
+            self.volunteers.prime(volunteer.id, volunteer)
+            self.volunteers_by_email.prime(volunteer.email, volunteer)
+            shared[key] = volunteer
+        return shared
+
+    async def recipients_by_ids(self, keys: list[str]) -> dict[str, Recipient]:
+        return self.share_recipients(
+            await lookup(self.db, RECIPIENT_BY_IDS, keys, recipient_from_row)
+        )
+
+    async def recipients_by_emails(self, keys: list[str]) -> dict[str, Recipient]:
+        return self.share_recipients(
+            await lookup(self.db, RECIPIENT_BY_EMAILS, keys, recipient_from_row)
+        )
+
+    async def recipients_by_requirements(self, keys: list[str]) -> dict[str, Recipient]:
+        return self.share_recipients(
+            await lookup(self.db, RECIPIENT_BY_REQUIREMENTS, keys, recipient_from_row)
+        )
+
+    def share_recipients(self, found: dict[str, Recipient]) -> dict[str, Recipient]:
+        shared = {}
+        for key, recipient in found.items():
+            if (known := self.recipients.futures.get(recipient.id)) and known.done():
+                recipient = known.result()
+            self.recipients.prime(recipient.id, recipient)
+            self.recipients_by_email.prime(recipient.email, recipient)
+            shared[key] = recipient
+        return shared
+
+    async def requirements_by_ids(
+        self, keys: list[str]
+    ) -> dict[str, RequirementRecord]:
+        return {r.id: r for r in await get_requirements_by_ids(self.db, keys)}
+
+    async def funds_by_ids(self, keys: list[str]) -> dict[str, FundRecord]:
+        return await lookup(self.db, FUND_BY_IDS, keys, fund_record)
+
+
+def get_loaders(req: Request) -> Loaders:
+    # Created on first use and dropped with the request.
+    if (loaders := getattr(req.state, "loaders", None)) is None:
+        loaders = req.state.loaders = Loaders(req.app.state.db)
+    return loaders
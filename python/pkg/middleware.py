@@ -1,10 +1,26 @@
-from fastapi import Request
+from collections import OrderedDict
+from fastapi import HTTPException, Request
 import json
+import math
+import os
+import time
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from pkg.replicas import primary_session
+from pkg.utils import decode_access_token
+
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+REPLICA_STICKY_MAX_KEYS = int(os.getenv("REPLICA_STICKY_MAX_KEYS", 10000))
+REPLICA_STICKY_COOKIE = "primary_until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
 
 class PrintBodyMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
+        # Bulk uploads (CSV/NDJSON imports, files) are streamed by their
+        # handlers; reading them here would buffer the whole body.
+        if not request.headers.get("content-type", "").startswith("application/json"):
+            return await call_next(request)
         body = await request.body()
         try:
             body_str = body.decode("utf-8")
@@ -18,3 +34,70 @@ class PrintBodyMiddleware(BaseHTTPMiddleware):
         finally:
             response = await call_next(request)
             return response
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    # Requests that write read from the primary, and so does every request
+    # with the same token for REPLICA_STICKY_SECONDS afterwards, so a client
+    # never reads a replica that has not caught up with its own write. The
+    # window is tracked per process and also sent back as a cookie, since the
+    # next request may be served by another worker or pod.
+    def __init__(self, app):
+        super().__init__(app)
+        self._last_write: OrderedDict[str, float] = OrderedDict()
+
+    async def dispatch(self, request: Request, call_next):
+        if not request.app.state.db.reader.replicas:
+            return await call_next(request)
+        key = request.headers.get("token") or request.query_params.get("access_token")
+        writes = request.method not in SAFE_METHODS
+        wrote_at = self._last_write.get(key) if key else None
+        if (
+            not writes
+            and (
+                wrote_at is None or time.monotonic() - wrote_at > REPLICA_STICKY_SECONDS
+            )
+            and not self._sticky_cookie(request)
+        ):
+            return await call_next(request)
+
+        with primary_session():
+            response = await call_next(request)
+        if not writes or response.status_code >= 400:
+            return response
+        response.set_cookie(
+            REPLICA_STICKY_COOKIE,
+            str(time.time() + REPLICA_STICKY_SECONDS),
+            max_age=math.ceil(REPLICA_STICKY_SECONDS),
+            httponly=True,
+            samesite="lax",
+        )
+        if key:
+            self._last_write[key] = time.monotonic()
+            self._last_write.move_to_end(key)
+            while len(self._last_write) > REPLICA_STICKY_MAX_KEYS:
+                self._last_write.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _sticky_cookie(request: Request) -> bool:
+        try:
+            return float(request.cookies.get(REPLICA_STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class ActivityMiddleware(BaseHTTPMiddleware):
+    # Marks the owner of a valid token as seen; the buffer writes it later.
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        activity = getattr(request.app.state, "activity", None)
+        token = request.headers.get("token") or request.query_params.get("access_token")
+        if activity is not None and token:
+            try:
+                user_id = decode_access_token(token).get("id")
+            except HTTPException:
+                user_id = None
+            if user_id:
+                activity.seen(user_id)
+        return response
@@ -2,7 +2,7 @@ from datetime import date
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, PositiveInt
 
 
 class IdMixin(BaseModel):
@@ -45,6 +45,13 @@ class CategoryEnum(str, Enum):
     other = "Other"
 
 
+class ReportDocumentStatusEnum(str, Enum):
+    pending = "Pending"
+    processing = "Processing"
+    done = "Done"
+    failed = "Failed"
+
+
 class RoleEnum(str, Enum):
     admin = "Admin"
     volunteer = "Volunteer"
@@ -86,6 +93,13 @@ class ReportBase(BaseModel):
 class Report(ReportBase, IdMixin): ...
 
 
+class ReportDocument(BaseModel):
+    status: ReportDocumentStatusEnum
+    pages: int | None = None
+    preview: str | None = None
+    error: str | None = None
+
+
 # Item Schema
 class ItemBase(BaseModel):
     name: str
@@ -98,6 +112,11 @@ class Item(ItemBase, IdMixin):
     items_taken: Optional[int] = None
 
 
+class ItemReservationCreate(BaseModel):
+    item_id: str
+    quantity: PositiveInt
+
+
 # Requirement Schema
 class RequirementBase(BaseModel):
     name: str | None = None
@@ -113,6 +132,22 @@ class RequirementCreate(RequirementBase):
 class Requirement(RequirementBase, IdMixin): ...
 
 
+class RequirementImport(RequirementBase):
+    ref: str | None = None
+    items: list[ItemBase] = []
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    requirements_created: int = 0
+    items_created: int = 0
+    errors: list[ImportRowError] = []
+
+
 # Fund Schema
 class FundBase(BaseModel):
     name: str | None = None
@@ -125,7 +160,9 @@ class FundBase(BaseModel):
 
 class FundCreate(FundBase):
     report_id: Optional[str] = None
+    # Item IDs reserved in full; use reservations for partial quantities.
     items: list[str] = []
+    reservations: list[ItemReservationCreate] = []
 
 
 class Fund(FundBase, IdMixin): ...
@@ -160,16 +197,40 @@ class RequirementWithItemsAndFund(RequirementWithItems):
 
 
 class DetailFund(FundBase, IdMixin):
+    report_file: str | None = None
+    report_document: ReportDocument | None = None
     requirement: RequirementWithItems | None = None
     report: Report | None = None
     volunteer: Volunteer | None = None
 
 
+class ReportSearchResult(BaseModel):
+    fund: Fund
+    snippet: str
+    pages: int | None = None
+    preview: str | None = None
+
+
+class Blob(BaseModel):
+    digest: str
+    size: int
+    content_type: str
+
+
 class Dashboard(BaseModel):
     funds: list[DetailFund]
     requirements: list[RequirementWithItems]
 
 
+class Stats(BaseModel):
+    funds_by_status: dict[str, int] = {}
+    items_by_category: dict[str, int] = {}
+    outstanding_by_category: dict[str, int] = {}
+    item_quantity: dict[str, int] = {}
+    requirements_by_priority: dict[str, int] = {}
+    reports_by_rating: dict[str, int] = {}
+
+
 class LoginResponse(BaseModel):
     access_token: str
     role: RoleEnum
@@ -1,5 +1,3 @@
-import numpy as np
-from scipy.optimize import linear_sum_assignment
 from pkg.models import Requirement, RequirementWithVolonteer, Volunteer
 
 
@@ -8,6 +6,11 @@ def optimize_requirement_assignment(
     volunteers: list[Volunteer],
     max_capacity: int = 3,
 ) -> dict[str, list[str]] | None:
+    # NumPy and SciPy take longer to import than the rest of the app; only
+    # pay for them when an assignment is actually computed.
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
+
     num_req = len(requirements)
     num_vol = len(volunteers)
     cost_matrix = np.zeros((num_vol, num_req))
@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+
+# Runs in the report worker processes, so it only imports what extraction
+# needs.
+
+REPORT_MAX_PAGES = int(os.getenv("REPORT_MAX_PAGES", 200))
+REPORT_TEXT_LIMIT = int(os.getenv("REPORT_TEXT_LIMIT", 200_000))
+REPORT_PREVIEW_WIDTH = int(os.getenv("REPORT_PREVIEW_WIDTH", 480))
+REPORT_PREVIEW_TIMEOUT_SECONDS = float(os.getenv("REPORT_PREVIEW_TIMEOUT_SECONDS", 60))
+
+
+class ReportExtractionError(Exception): ...
+
+
+def extract_report(path: str, preview_base: str) -> tuple[int, str, bool]:
+    # Returns the page count, the text of the first REPORT_MAX_PAGES pages
+    # and whether a preview of the first page was written to
+    # preview_base + ".png".
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ReportExtractionError("pypdf is not installed")
+
+    try:
+        reader = PdfReader(path)
+        pages = len(reader.pages)
+        text, size = [], 0
+        for i in range(min(pages, REPORT_MAX_PAGES)):
+            chunk = reader.pages[i].extract_text() or ""
+            text.append(chunk)
+            size += len(chunk)
+            if size >= REPORT_TEXT_LIMIT:
+                break
+    except Exception as e:
+        # pypdf raises all sorts of errors on broken files; only the message
+        # crosses the process boundary.
+        raise ReportExtractionError(f"Unreadable PDF: {e}") from None
+    return (
+        pages,
+        "\n".join(text)[:REPORT_TEXT_LIMIT],
+        render_preview(path, preview_base),
+    )
+
+
+def render_preview(path: str, preview_base: str) -> bool:
+    # pdftoppm comes with poppler-utils; without it reports have no preview.
+    if shutil.which("pdftoppm") is None:
+        return False
+    try:
+        subprocess.run(
+            [
+                "pdftoppm",
+                "-png",
+                "-singlefile",
+                "-f",
+                "1",
+                "-l",
+                "1",
+                "-scale-to-x",
+                str(REPORT_PREVIEW_WIDTH),
+                "-scale-to-y",
+                "-1",
+                path,
+                preview_base,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=REPORT_PREVIEW_TIMEOUT_SECONDS,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return os.path.exists(preview_base + ".png")
@@ -0,0 +1,28 @@
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+
+from pkg.queries import Row
+
+
+class RowPostgresConnection(PostgresConnection):
+    # asyncpg hands back the column names lower-cased; Row lets every query
+    # look its columns up as written, the same as on SQLite.
+    async def fetch_all(self, query) -> list[Row]:
+        return [Row(zip(r.keys(), r.values())) for r in await super().fetch_all(query)]
+
+    async def fetch_one(self, query) -> Row | None:
+        row = await super().fetch_one(query)
+        return None if row is None else Row(zip(row.keys(), row.values()))
+
+    async def fetch_val(self, query, column=0):
+        # By position, like the stock connection.
+        row = await super().fetch_one(query)
+        return None if row is None else row[column]
+
+    async def iterate(self, query):
+        async for row in super().iterate(query):
+            yield Row(zip(row.keys(), row.values()))
+
+
+class RowPostgresBackend(PostgresBackend):
+    def connection(self) -> RowPostgresConnection:
+        return RowPostgresConnection(self, self._dialect)
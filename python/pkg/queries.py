@@ -0,0 +1,88 @@
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from databases import Database as DatabaseCore
+
+NAMED_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def expand_in(name: str, values) -> tuple[str, dict]:
+    params = {f"{name}_{i}": value for i, value in enumerate(values)}
+    return ", ".join(f":{key}" for key in params), params
+
+
+def named_to_positional(query: str) -> tuple[str, list[str]]:
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        if match[1] not in names:
+            names.append(match[1])
+        return f"${names.index(match[1]) + 1}"
+
+    return NAMED_PARAM.sub(replace, query), names
+
+
+@dataclass(frozen=True, slots=True)
+class NamedQuery:
+    name: str
+    sqlite: str
+    # Postgres text with $n placeholders and the parameter name for each n.
+    # The text never changes, so asyncpg prepares it once per connection
+    # and serves it from its statement cache afterwards.
+    postgres: str
+    params: tuple[str, ...]
+
+    def sqlite_bind(self, values: dict) -> tuple[str, dict]:
+        # List parameters are written as IN (:name) in the SQLite text and
+        # as = ANY(:name) in the Postgres one.
+        query = self.sqlite
+        for name, value in list(values.items()):
+            if isinstance(value, (list, tuple)):
+                placeholders, params = expand_in(name, value)
+                query = re.sub(rf"(?<![:\w]):{name}\b", placeholders, query)
+                values = {k: v for k, v in values.items() if k != name} | params
+        return query, values
+
+    def postgres_bind(self, values: dict) -> tuple:
+        return tuple(values[name] for name in self.params)
+
+
+QUERIES: dict[str, NamedQuery] = {}
+
+
+def register(name: str, sqlite: str, postgres: str | None = None) -> str:
+    if name in QUERIES:
+        raise ValueError(f"Query {name!r} is already registered")
+    text, params = named_to_positional(postgres or sqlite)
+    QUERIES[name] = NamedQuery(name, sqlite, text, tuple(params))
+    return name
+
+
+class Row(Mapping):
+    # Unquoted identifiers come back lower-cased from Postgres, so rows are
+    # looked up case-insensitively on both backends.
+    __slots__ = ("_values",)
+
+    def __init__(self, items):
+        self._values = {key.lower(): value for key, value in items}
+
+    def __getitem__(self, key: str):
+        return self._values[key.lower()]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class RowDatabase(DatabaseCore):
+    # A databases.Database whose Postgres rows are Rows (see pkg.postgres),
+    # so row["ID"] works on both backends. The backend module, and asyncpg
+    # with it, is only imported for a Postgres URL.
+    SUPPORTED_BACKENDS = {
+        **DatabaseCore.SUPPORTED_BACKENDS,
+        "postgresql": "pkg.postgres:RowPostgresBackend",
+        "postgres": "pkg.postgres:RowPostgresBackend",
+    }
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+LOGIN_PATH = "/api/profile/login"
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 10))
+LOGIN_EMAIL_BURST = int(os.getenv("LOGIN_EMAIL_BURST", 5))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", 2))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+# The number of proxies in front of the app that append to X-Forwarded-For
+# (any other non-empty value counts as one). Left unset, the client is the
+# peer address, which behind a proxy is the proxy's.
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "")
+FORWARDED_PROXIES = (
+    int(TRUST_FORWARDED_FOR)
+    if TRUST_FORWARDED_FOR.isdigit()
+    else int(TRUST_FORWARDED_FOR != "")
+)
+
+
+class BucketBackend(ABC):
+    # Returns 0 when a token was taken, otherwise seconds until one is available.
+    @abstractmethod
+    async def acquire(self, key: str, capacity: int, per_second: float) -> float: ...
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class MemoryBucketBackend(BucketBackend):
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    async def acquire(self, key: str, capacity: int, per_second: float) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(capacity, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(
+                capacity, bucket.tokens + (now - bucket.updated) * per_second
+            )
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / per_second
+
+
+class DatabaseBucketBackend(BucketBackend):
+    # Buckets live in the shared database so every replica sees the same
+    # counts. The refill and the decrement happen in a single statement.
+    def __init__(self, db):
+        self.db = db
+        least = "LEAST" if db.connection.url.dialect == "postgresql" else "MIN"
+        refilled = (
+            f"{least}(:capacity, RateLimitBucket.Tokens"
+            " + (:now - RateLimitBucket.Updated) * :per_second)"
+        )
+        self.query = f"""
+INSERT INTO RateLimitBucket (Key, Tokens, Updated)
+VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (Key) DO UPDATE SET Tokens = {refilled} - 1, Updated = :now
+WHERE {refilled} >= 1
+RETURNING Tokens
+"""
+
+    async def acquire(self, key: str, capacity: int, per_second: float) -> float:
+        row = await self.db.connection.fetch_one(
+            query=self.query,
+            values={
+                "key": key,
+                "capacity": capacity,
+                "per_second": per_second,
+                "now": time.time(),
+            },
+        )
+        return 0.0 if row else 1 / per_second
+
+
+def get_client_ip(request: Request, proxies: int = FORWARDED_PROXIES) -> str:
+    # Each proxy appends the address it received the request from, so the
+    # entry added by the outermost trusted proxy is proxies from the right.
+    # Anything left of it was sent by the client and may be forged.
+    if proxies and (forwarded := request.headers.get("x-forwarded-for")):
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        return hops[-min(proxies, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+class LoginRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, backend: BucketBackend | None = None):
+        super().__init__(app)
+        self.backend = backend or MemoryBucketBackend()
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "POST" or request.url.path != LOGIN_PATH:
+            return await call_next(request)
+
+        backend = getattr(request.app.state, "rate_limit_backend", self.backend)
+        retry_after = await backend.acquire(
+            f"ip:{get_client_ip(request)}",
+            LOGIN_IP_BURST,
+            LOGIN_IP_PER_MINUTE / 60,
+        )
+        if not retry_after and (email := await self._get_email(request)):
+            retry_after = await backend.acquire(
+                f"email:{email}",
+                LOGIN_EMAIL_BURST,
+                LOGIN_EMAIL_PER_MINUTE / 60,
+            )
+
+        if retry_after:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many login attempts"},
+                headers={"Retry-After": str(int(retry_after) + 1)},
+            )
+        return await call_next(request)
+
+    async def _get_email(self, request: Request) -> str | None:
+        try:
+            email = json.loads(await request.body()).get("email")
+        except (ValueError, AttributeError):
+            return None
+        return email.strip().lower() if isinstance(email, str) else None
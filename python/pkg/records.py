@@ -0,0 +1,69 @@
+from dataclasses import dataclass, field
+from datetime import date
+
+# Rows of the hot list queries, kept as plain slotted records instead of
+# pydantic models: nothing is validated or copied on the way out of the
+# database. Field names match the API models (Fund, Item, Recipient,
+# RequirementWithItems), so a record is written to JSON through a
+# TypeAdapter of its own type (see model_response) or validated into the
+# model with from_attributes when it is embedded in one. Enum columns keep
+# the stored string, which is the enum value.
+
+
+@dataclass(slots=True)
+class FundRecord:
+    id: str
+    name: str | None
+    description: str | None
+    mono_jar_url: str | None
+    long_jar_id: str | None
+    status: str
+    picture: str | None
+
+
+@dataclass(slots=True)
+class ItemRecord:
+    id: str
+    name: str
+    count: int
+    category: str
+    reserved_by: str | None
+    items_taken: int | None
+
+
+@dataclass(slots=True)
+class RecipientRecord:
+    id: str
+    name: str
+    email: str
+    profile_pic: str | None = None
+
+
+@dataclass(slots=True)
+class RequirementRecord:
+    id: str
+    name: str | None
+    # SQLite hands back the ISO text, Postgres a date.
+    deadline: date | str | None
+    priority: str | None
+    description: str | None
+    items: list[ItemRecord] = field(default_factory=list)
+    recipient: RecipientRecord | None = None
+
+
+def fund_record(row) -> FundRecord:
+    return FundRecord(
+        row["ID"],
+        row["Name"],
+        row["Description"],
+        row["MonoJarUrl"],
+        row["LongJarID"],
+        row["Status"],
+        row["Picture"],
+    )
+
+
+def record_fields(record) -> dict:
+    # A shallow view of the record for building a model around it, e.g.
+    # DetailFund(**record_fields(fund), report=...).
+    return {name: getattr(record, name) for name in record.__slots__}
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, TypeVar
+
+from databases import Database as DatabaseCore
+
+from pkg.queries import RowDatabase
+
+REPLICA_EJECT_SECONDS = float(os.getenv("REPLICA_EJECT_SECONDS", 30))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", 10))
+
+T = TypeVar("T")
+
+# Set for requests that write and for users who wrote recently; everything
+# read while it is set goes to the primary.
+use_primary: ContextVar[bool] = ContextVar("use_primary", default=False)
+# The task that has a transaction open on the primary. Its writes are not
+# committed yet, so only its own primary connection can read them back;
+# tasks it starts inherit the variable but get connections of their own.
+transaction_task: ContextVar[asyncio.Task | None] = ContextVar(
+    "transaction_task", default=None
+)
+
+
+@contextmanager
+def primary_session():
+    token = use_primary.set(True)
+    try:
+        yield
+    finally:
+        use_primary.reset(token)
+
+
+def replica_urls() -> list[str]:
+    urls = os.getenv("DATABASE_REPLICA_URLS", "")
+    return [
+        "postgresql://" + url.removeprefix("postgres://")
+        if url.startswith("postgres://")
+        else url
+        for url in (url.strip() for url in urls.split(","))
+        if url
+    ]
+
+
+class Replica:
+    __slots__ = ("connection", "ejected_until")
+
+    def __init__(self, url: str, options: dict):
+        self.connection = RowDatabase(url, **options)
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+    def eject(self, reason: object):
+        if self.healthy:
+            logging.warning("Ejecting replica %s: %s", self.connection.url, reason)
+        self.ejected_until = time.monotonic() + REPLICA_EJECT_SECONDS
+
+
+class ReadRouter:
+    # Spreads reads over the healthy replicas and falls back to the primary
+    # when there are none, when the caller asked for the primary, or when a
+    # replica fails a query the primary can answer (the replica is then
+    # ejected for REPLICA_EJECT_SECONDS). local is a read-only pool on the
+    # primary's own database (SQLite) that takes the primary's share of
+    # the reads.
+    def __init__(
+        self,
+        primary: DatabaseCore,
+        urls: list[str],
+        options: dict = {},
+        local: DatabaseCore | None = None,
+    ):
+        self.primary = primary
+        self.local = local
+        self.replicas = [Replica(url, options) for url in urls]
+        self._next = 0
+
+    async def connect(self):
+        if self.local is not None:
+            await self.local.connect()
+        for replica in self.replicas:
+            try:
+                await replica.connection.connect()
+            except Exception as e:
+                replica.eject(e)
+
+    async def disconnect(self):
+        for replica in self.replicas:
+            if replica.connection.is_connected:
+                await replica.connection.disconnect()
+        if self.local is not None and self.local.is_connected:
+            await self.local.disconnect()
+
+    def choose(self) -> Replica | None:
+        if use_primary.get():
+            return None
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy and replica.connection.is_connected:
+                return replica
+        return None
+
+    def fallback(self) -> DatabaseCore:
+        # The local pool sees every committed write, so use_primary does not
+        # apply to it; reads inside an open transaction stay on the primary.
+        if self.local is None or transaction_task.get() is asyncio.current_task():
+            return self.primary
+        return self.local
+
+    async def run(self, read: Callable[[DatabaseCore], Awaitable[T]]) -> T:
+        if (replica := self.choose()) is None:
+            return await read(self.fallback())
+        try:
+            return await read(replica.connection)
+        except Exception as e:
+            error = e
+        # A query that is broken fails on the primary too and is raised from
+        # there; only a replica-specific failure ejects the replica.
+        result = await read(self.fallback())
+        replica.eject(error)
+        return result
+
+    async def fetch_all(self, query: str, values: dict | None = None):
+        return await self.run(lambda c: c.fetch_all(query=query, values=values))
+
+    async def fetch_one(self, query: str, values: dict | None = None):
+        return await self.run(lambda c: c.fetch_one(query=query, values=values))
+
+    async def fetch_val(self, query: str, values: dict | None = None):
+        return await self.run(lambda c: c.fetch_val(query=query, values=values))
+
+    def iterate(self, query: str, values: dict | None = None):
+        # Streams cannot be retried halfway, so a failing replica only
+        # fails this one export.
+        replica = self.choose()
+        connection = replica.connection if replica else self.fallback()
+        return connection.iterate(query=query, values=values)
+
+    async def check(self):
+        for replica in self.replicas:
+            try:
+                if not replica.connection.is_connected:
+                    await replica.connection.connect()
+                if replica.connection.url.dialect == "postgresql":
+                    # An idle primary leaves the replay timestamp behind, so
+                    # only count lag while WAL is still waiting to be replayed.
+                    lag = await replica.connection.fetch_val(
+                        """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+                    )
+                    if lag > REPLICA_MAX_LAG_SECONDS:
+                        replica.eject(f"replication lag {lag:.1f}s")
+                        continue
+                else:
+                    await replica.connection.fetch_val("SELECT 1")
+            except Exception as e:
+                replica.eject(e)
+                continue
+            if not replica.healthy:
+                logging.info("Replica %s is back", replica.connection.url)
+                replica.ejected_until = 0.0
+
+    async def monitor(self):
+        while True:
+            await asyncio.sleep(REPLICA_CHECK_SECONDS)
+            try:
+                await self.check()
+            except Exception:
+                logging.exception("Failed to check replicas")
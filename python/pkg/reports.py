@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pkg.database import (
+    Database,
+    claim_report_document,
+    fail_report_document,
+    finish_report_document,
+    retry_report_document,
+    save_blob,
+)
+from pkg.pdf import ReportExtractionError, extract_report
+from pkg.storage import get_storage
+from pkg.utils import blob_url
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+REPORT_TASKS_PER_CHILD = int(os.getenv("REPORT_TASKS_PER_CHILD", 50))
+REPORT_POLL_SECONDS = float(os.getenv("REPORT_POLL_SECONDS", 30))
+# A child still extracting after this long is killed and the document
+# marked Failed.
+REPORT_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("REPORT_EXTRACT_TIMEOUT_SECONDS", 120))
+
+
+class ReportPipeline:
+    # Extracts the text, page count and a first-page preview of uploaded
+    # report PDFs in up to REPORT_WORKERS processes, away from the request
+    # path. Work is claimed from ReportDocument, so all workers and pods
+    # share one queue and documents abandoned by a crash are picked up again.
+    def __init__(self, db: Database):
+        self.db = db
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(REPORT_WORKERS)
+        self._wake = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    def wake(self):
+        self._wake.set()
+
+    def executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the server process runs threads and an
+        # event loop, and the children only need pkg.pdf.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=REPORT_TASKS_PER_CHILD,
+            )
+        return self._executor
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), REPORT_POLL_SECONDS)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.claim()
+            except Exception:
+                logging.exception("Failed to claim report documents")
+
+    async def claim(self):
+        # Only claims a document once a slot is free, so the rest stay
+        # available to other workers.
+        while True:
+            await self._slots.acquire()
+            try:
+                claimed = await claim_report_document(self.db)
+            except BaseException:
+                self._slots.release()
+                raise
+            if claimed is None:
+                self._slots.release()
+                return
+            task = asyncio.create_task(self.process(*claimed))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def process(self, fund_id: str, digest: str):
+        executor = None
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = await asyncio.to_thread(
+                    get_storage().local_copy, digest, directory
+                )
+                preview_base = os.path.join(directory, "preview")
+                executor = self.executor()
+                pages, text, has_preview = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        executor, extract_report, str(path), preview_base
+                    ),
+                    REPORT_EXTRACT_TIMEOUT_SECONDS,
+                )
+                preview = None
+                if has_preview:
+                    with open(preview_base + ".png", "rb") as f:
+                        preview_digest, _ = await save_blob(self.db, f, "image/png")
+                    preview = blob_url(preview_digest)
+            await finish_report_document(self.db, fund_id, digest, pages, text, preview)
+            logging.info("Processed report of fund %s (%d pages)", fund_id, pages)
+        except ReportExtractionError as e:
+            await fail_report_document(self.db, fund_id, digest, str(e))
+        except TimeoutError:
+            # Cancelling the future does not stop a running child.
+            logging.warning("Timed out extracting report of fund %s", fund_id)
+            self.recycle(executor)
+            await fail_report_document(self.db, fund_id, digest, "Extraction timed out")
+        except BrokenProcessPool:
+            # A child died (e.g. out of memory, or a pool recycled after a
+            # timeout); start a fresh pool and try the document again.
+            logging.exception("Lost the report worker for fund %s", fund_id)
+            if self._executor is executor:
+                self._executor = None
+            await retry_report_document(self.db, fund_id, digest)
+        except Exception:
+            logging.exception("Failed to process report of fund %s", fund_id)
+            await fail_report_document(self.db, fund_id, digest, "Processing failed")
+        finally:
+            self._slots.release()
+
+    def recycle(self, executor: ProcessPoolExecutor):
+        # Kills the children of the pool; documents they were still
+        # extracting end with BrokenProcessPool and are retried.
+        if self._executor is executor:
+            self._executor = None
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,21 @@
+from functools import cache
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+class ModelResponse(Response):
+    media_type = "application/json"
+
+
+@cache
+def get_adapter(tp: Any) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+
+def model_response(tp: Any, content: Any, status_code: int = 200) -> ModelResponse:
+    # Serialize straight to bytes with pydantic-core. Returning a Response from
+    # an endpoint makes FastAPI skip response_model validation and
+    # jsonable_encoder, so the payload is only walked once.
+    return ModelResponse(get_adapter(tp).dump_json(content), status_code=status_code)
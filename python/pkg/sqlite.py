@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+
+import aiosqlite
+from databases import Database as DatabaseCore, DatabaseURL
+from databases.backends.sqlite import SQLiteBackend, SQLitePool
+from databases.core import Transaction
+
+from pkg.replicas import transaction_task
+
+SQLITE_PERFORMANCE_MODE = os.getenv("SQLITE_PERFORMANCE_MODE", "1") == "1"
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", 4))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", 32 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_OPTIMIZE_SECONDS = float(os.getenv("SQLITE_OPTIMIZE_SECONDS", 3600))
+
+
+def sqlite_performance_mode(url: str) -> bool:
+    # In-memory databases live and die with one connection, so they keep
+    # the stock backend.
+    url = DatabaseURL(url)
+    return (
+        SQLITE_PERFORMANCE_MODE
+        and url.dialect == "sqlite"
+        and url.database not in ("", ":memory:")
+        and url.options.get("mode") != "memory"
+    )
+
+
+class SQLiteConnectionPool(SQLitePool):
+    # The stock pool opens a new connection for every acquire. This one
+    # keeps up to size connections open, so the page cache and memory map
+    # survive between queries and the pragmas are set once per connection.
+    def __init__(self, url: DatabaseURL, size: int, query_only: bool, **options):
+        super().__init__(url, **options)
+        self.size = size
+        self.query_only = query_only
+        self.idle: list[aiosqlite.Connection] = []
+        self.opened: list[aiosqlite.Connection] = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def acquire(self) -> aiosqlite.Connection:
+        await self.slots.acquire()
+        try:
+            if self.idle:
+                return self.idle.pop()
+            connection = await self.open()
+        except BaseException:
+            self.slots.release()
+            raise
+        self.opened.append(connection)
+        return connection
+
+    async def open(self) -> aiosqlite.Connection:
+        connection = aiosqlite.connect(
+            database=self._database, isolation_level=None, **self._options
+        )
+        await connection.__aenter__()
+        try:
+            pragmas = [
+                f"busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+                "synchronous = NORMAL",
+                f"mmap_size = {SQLITE_MMAP_BYTES}",
+                f"cache_size = {-SQLITE_CACHE_KIB}",
+                "temp_store = MEMORY",
+            ]
+            if self.query_only:
+                pragmas.append("query_only = 1")
+            else:
+                # Stored in the file; readers opened later find it set.
+                pragmas.insert(0, "journal_mode = WAL")
+            for pragma in pragmas:
+                async with connection.execute(f"PRAGMA {pragma}"):
+                    pass
+        except BaseException:
+            await connection.__aexit__(None, None, None)
+            raise
+        return connection
+
+    async def release(self, connection: aiosqlite.Connection):
+        try:
+            # A task cancelled mid-transaction must not hand its
+            # transaction to the next one.
+            if connection.in_transaction:
+                await connection.rollback()
+            self.idle.append(connection)
+        except Exception:
+            logging.exception("Dropping a broken SQLite connection")
+            self.opened.remove(connection)
+            await connection.__aexit__(None, None, None)
+        finally:
+            self.slots.release()
+
+    async def close(self):
+        connections, self.opened, self.idle = self.opened, [], []
+        for connection in connections:
+            if not self.query_only:
+                try:
+                    async with connection.execute("PRAGMA optimize"):
+                        pass
+                except Exception:
+                    logging.exception("Failed to optimize the SQLite database")
+            await connection.__aexit__(None, None, None)
+
+
+class SQLitePerformanceBackend(SQLiteBackend):
+    def __init__(self, url: DatabaseURL | str, **options):
+        size = options.pop("pool_size", 1)
+        query_only = options.pop("query_only", False)
+        super().__init__(url, **options)
+        self._pool = SQLiteConnectionPool(
+            self._database_url, size, query_only, **self._options
+        )
+
+    async def connect(self):
+        # Opens the writer right away, so the database is in WAL mode
+        # before the first reader connects.
+        if not self._pool.query_only:
+            await self._pool.release(await self._pool.acquire())
+
+    async def disconnect(self):
+        await self._pool.close()
+        await super().disconnect()
+
+
+class SQLiteTransaction(Transaction):
+    # Marks the task as inside a transaction, so ReadRouter keeps its reads
+    # on the writer instead of the read-only pool.
+    async def __aenter__(self) -> "SQLiteTransaction":
+        await super().__aenter__()
+        self._transaction_task = transaction_task.set(asyncio.current_task())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        transaction_task.reset(self._transaction_task)
+        await super().__aexit__(*exc_info)
+
+
+class SQLiteDatabase(DatabaseCore):
+    # A databases.Database on SQLiteConnectionPool. Takes pool_size and
+    # query_only on top of the aiosqlite connect options.
+    SUPPORTED_BACKENDS = {
+        **DatabaseCore.SUPPORTED_BACKENDS,
+        "sqlite": "pkg.sqlite:SQLitePerformanceBackend",
+    }
+
+    def transaction(self, *, force_rollback: bool = False, **kwargs) -> Transaction:
+        return SQLiteTransaction(
+            self.connection, force_rollback=force_rollback, **kwargs
+        )
+
+
+async def optimize_forever(connection: DatabaseCore):
+    # Lets SQLite refresh the statistics of tables whose size changed
+    # enough to matter for the query planner; cheap when nothing did.
+    while True:
+        await asyncio.sleep(SQLITE_OPTIMIZE_SECONDS)
+        try:
+            await connection.execute("PRAGMA optimize")
+        except Exception:
+            logging.exception("Failed to optimize the SQLite database")
@@ -0,0 +1,20 @@
+import asyncio
+import logging
+import os
+
+from pkg.database import Database, reconcile_stats
+
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", 3600))
+
+
+async def reconcile_stats_forever(db: Database):
+    # The write paths keep the counters current; this only repairs drift
+    # from writes that bypassed them (manual SQL, failed requests, imports
+    # made by older versions).
+    while True:
+        try:
+            if drifted := await reconcile_stats(db):
+                logging.warning("Reconciled %d drifted stat counters", drifted)
+        except Exception:
+            logging.exception("Failed to reconcile stat counters")
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+from abc import ABC, abstractmethod
+from functools import cache
+
+from pkg.utils import UPLOAD_DIR
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "uploads")
+# Set for MinIO and other S3-compatible servers.
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PREFIX = os.getenv("S3_PREFIX", "blobs/")
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", 8 * 1024 * 1024))
+STORAGE_PRESIGN_SECONDS = int(os.getenv("STORAGE_PRESIGN_SECONDS", 3600))
+# A local directory caching blobs read from object storage; without it
+# downloads are redirected to presigned URLs.
+STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR") or None
+STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", 1024**3))
+
+BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes of the image formats accepted for photos. Blobs of any other
+# type are only ever served as downloads.
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+IMAGE_TYPES = frozenset(
+    {content_type for _, content_type in IMAGE_SIGNATURES} | {"image/webp"}
+)
+
+
+def image_content_type(file) -> str | None:
+    # The type of an uploaded image from its first bytes; the header sent by
+    # the client is not trusted. Leaves the file at its start.
+    head = file.read(12)
+    file.seek(0)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+def blob_disposition(content_type: str) -> str:
+    return "inline" if content_type in IMAGE_TYPES else "attachment"
+
+
+def shard(digest: str) -> str:
+    # Two levels of 256 directories keep every directory small.
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+class StorageBackend(ABC):
+    # Blobs are written once under their digest and never change.
+    @abstractmethod
+    def put(self, source: pathlib.Path, digest: str, content_type: str):
+        # Takes ownership of source, a finished temp file.
+        ...
+
+    @abstractmethod
+    def delete(self, digest: str): ...
+
+    @abstractmethod
+    def local_path(self, digest: str) -> pathlib.Path | None:
+        # A local copy to serve, or None when the blob is missing or only
+        # reachable through presigned_url.
+        ...
+
+    def presigned_url(self, digest: str, content_type: str) -> str | None:
+        return None
+
+    def local_copy(self, digest: str, directory: str) -> pathlib.Path:
+        # A local file with the blob's bytes for processing; it may be
+        # created in directory, which the caller removes.
+        if (path := self.local_path(digest)) is None:
+            raise FileNotFoundError(digest)
+        return path
+
+    @abstractmethod
+    def temp_dir(self) -> pathlib.Path:
+        # Where uploads are staged; on the same filesystem as put's target.
+        ...
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: pathlib.Path):
+        self.root = root
+
+    def temp_dir(self) -> pathlib.Path:
+        path = self.root / "tmp"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def path(self, digest: str) -> pathlib.Path:
+        return self.root / shard(digest)
+
+    def put(self, source: pathlib.Path, digest: str, content_type: str):
+        path = self.path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Replacing an existing copy is harmless (same bytes).
+        os.replace(source, path)
+
+    def delete(self, digest: str):
+        self.path(digest).unlink(missing_ok=True)
+
+    def local_path(self, digest: str) -> pathlib.Path | None:
+        path = self.path(digest)
+        return path if path.is_file() else None
+
+
+class S3Storage(StorageBackend):
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        prefix: str = "",
+        cache: LocalStorage | None = None,
+    ):
+        # boto3 is only needed, and only imported, with this backend.
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.transfer = TransferConfig(
+            multipart_threshold=S3_PART_SIZE, multipart_chunksize=S3_PART_SIZE
+        )
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache = cache
+        self._cache_bytes: int | None = None
+
+    def temp_dir(self) -> pathlib.Path:
+        if self.cache is not None:
+            return self.cache.temp_dir()
+        path = UPLOAD_DIR / "tmp"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def key(self, digest: str) -> str:
+        return self.prefix + shard(digest)
+
+    def put(self, source: pathlib.Path, digest: str, content_type: str):
+        # Files over S3_PART_SIZE are sent as a multipart upload, one part
+        # at a time from disk.
+        self.client.upload_file(
+            str(source),
+            self.bucket,
+            self.key(digest),
+            ExtraArgs={
+                "ContentType": content_type,
+                "ContentDisposition": blob_disposition(content_type),
+                "CacheControl": BLOB_CACHE_CONTROL,
+            },
+            Config=self.transfer,
+        )
+        if self.cache is not None:
+            self.add_to_cache(source, digest)
+        else:
+            source.unlink(missing_ok=True)
+
+    def delete(self, digest: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(digest))
+        if self.cache is not None:
+            self.cache.delete(digest)
+
+    def local_path(self, digest: str) -> pathlib.Path | None:
+        if self.cache is None:
+            return None
+        if (path := self.cache.local_path(digest)) is not None:
+            return path
+        with tempfile.NamedTemporaryFile(dir=self.temp_dir(), delete=False) as tmp:
+            pass
+        try:
+            self.client.download_file(
+                self.bucket, self.key(digest), tmp.name, Config=self.transfer
+            )
+        except Exception as e:
+            os.unlink(tmp.name)
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in (
+                "404",
+                "NoSuchKey",
+            ):
+                return None
+            raise
+        self.add_to_cache(pathlib.Path(tmp.name), digest)
+        # Blobs larger than the whole cache are evicted straight away.
+        return self.cache.local_path(digest)
+
+    def local_copy(self, digest: str, directory: str) -> pathlib.Path:
+        if (path := self.local_path(digest)) is not None:
+            return path
+        path = pathlib.Path(directory) / digest
+        self.client.download_file(
+            self.bucket, self.key(digest), str(path), Config=self.transfer
+        )
+        return path
+
+    def presigned_url(self, digest: str, content_type: str) -> str | None:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.key(digest),
+                "ResponseContentType": content_type,
+                "ResponseContentDisposition": blob_disposition(content_type),
+            },
+            ExpiresIn=STORAGE_PRESIGN_SECONDS,
+        )
+
+    def add_to_cache(self, source: pathlib.Path, digest: str):
+        size = source.stat().st_size
+        self.cache.put(source, digest, "")
+        if self._cache_bytes is None:
+            self.trim_cache()
+        else:
+            self._cache_bytes += size
+            if self._cache_bytes > STORAGE_CACHE_MAX_BYTES:
+                self.trim_cache()
+
+    def trim_cache(self):
+        # Drops the least recently modified copies until the cache is back
+        # under STORAGE_CACHE_MAX_BYTES; they are downloaded again when
+        # needed. Only scans the cache when it first fills up.
+        tmp = self.cache.temp_dir()
+        files = [
+            (path.stat(), path)
+            for path in self.cache.root.rglob("*")
+            if path.is_file() and path.parent != tmp
+        ]
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, path in sorted(files, key=lambda f: f[0].st_mtime):
+            if total <= STORAGE_CACHE_MAX_BYTES:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+        self._cache_bytes = total
+
+
+@cache
+def get_storage() -> StorageBackend:
+    if STORAGE_BACKEND == "s3":
+        cache_dir = pathlib.Path(STORAGE_CACHE_DIR) if STORAGE_CACHE_DIR else None
+        logging.info("Storing uploads in S3 bucket %s", S3_BUCKET)
+        return S3Storage(
+            S3_BUCKET,
+            endpoint_url=S3_ENDPOINT_URL,
+            region=S3_REGION,
+            prefix=S3_PREFIX,
+            cache=LocalStorage(cache_dir) if cache_dir else None,
+        )
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}")
+    return LocalStorage(UPLOAD_DIR / "blobs")
+
+
+def stage_file(file) -> tuple[pathlib.Path, str, int]:
+    # Copies the upload to a temp file for StorageBackend.put and returns it
+    # with the upload's SHA-256 and size. Identical uploads end up in the
+    # same blob.
+    sha256, size = hashlib.sha256(), 0
+    with tempfile.NamedTemporaryFile(dir=get_storage().temp_dir(), delete=False) as tmp:
+        try:
+            while chunk := file.read(BLOB_CHUNK_SIZE):
+                sha256.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+    return pathlib.Path(tmp.name), sha256.hexdigest(), size
@@ -0,0 +1,74 @@
+import heapq
+import os
+import time
+from datetime import date
+
+URGENT_QUEUE_RELOAD_SECONDS = float(os.getenv("URGENT_QUEUE_RELOAD_SECONDS", 60))
+
+PRIORITY_RANK = {"High": 0, "Default": 1}
+
+
+class UrgentRequirementQueue:
+    # Min-heap of open requirements ordered by priority, then deadline (no
+    # deadline last), then ID. Updates and removals are lazy: the stale entry
+    # is flagged and skipped when it reaches the top.
+    def __init__(self):
+        self._heap: list[list] = []
+        self._entries: dict[str, list] = {}
+        self.loaded_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at > URGENT_QUEUE_RELOAD_SECONDS
+        )
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    @staticmethod
+    def _entry(
+        requirement_id: str, priority: str | None, deadline: date | str | None
+    ) -> list:
+        return [
+            PRIORITY_RANK.get(priority, len(PRIORITY_RANK)),
+            deadline is None,
+            str(deadline) if deadline is not None else "",
+            requirement_id,
+            True,
+        ]
+
+    def push(
+        self, requirement_id: str, priority: str | None, deadline: date | str | None
+    ):
+        self.remove(requirement_id)
+        entry = self._entry(requirement_id, priority, deadline)
+        self._entries[requirement_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, requirement_id: str):
+        if (entry := self._entries.pop(requirement_id, None)) is not None:
+            entry[-1] = False
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [entry for entry in self._heap if entry[-1]]
+                heapq.heapify(self._heap)
+
+    def replace_all(self, rows: list[tuple[str, str | None, date | str | None]]):
+        self._entries = {id: self._entry(id, *rest) for id, *rest in rows}
+        self._heap = list(self._entries.values())
+        heapq.heapify(self._heap)
+        self.loaded_at = time.monotonic()
+
+    def top(self, n: int) -> list[str]:
+        taken: list[list] = []
+        while self._heap and len(taken) < n:
+            entry = heapq.heappop(self._heap)
+            if entry[-1]:
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [entry[3] for entry in taken]
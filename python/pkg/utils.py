@@ -1,14 +1,14 @@
 import os
 from datetime import datetime, timedelta, timezone
+from functools import cache
 from typing import Optional
 
 import dotenv
 import jwt
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 import pathlib
-import shutil
+import re
 
 dotenv.load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "aslkdfjalskdfj")
@@ -17,16 +17,32 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 *
 UPLOAD_PATH = os.getenv("UPLOAD_PATH", "uploads")
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@cache
+def get_pwd_context():
+    # passlib and the bcrypt backend load on the first hash or verify, not
+    # when a worker boots.
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt hash of a random throwaway secret, same cost factor as real hashes.
+# Checked against when the email is unknown so a miss costs exactly as much
+# as a wrong password.
+DUMMY_PASSWORD_HASH = "$2b$12$9mK4cmQTeqSo/o/oUGRtfOiBbuNjCv3bWAMdeVVqB.pOsW6lwcCoq"
+
 
 def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    if not hashed_password:
+        get_pwd_context().verify(plain_password, DUMMY_PASSWORD_HASH)
+        return False
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -56,10 +72,18 @@ def decode_access_token(token: str):
 
 UPLOAD_DIR = pathlib.Path(UPLOAD_PATH)
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_URL_PREFIX = "/uploads/blobs/"
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def blob_url(digest: str) -> str:
+    return BLOB_URL_PREFIX + digest
 
 
-def save_file(file, filename: str) -> str:
-    file_path = UPLOAD_DIR / filename
-    with file_path.open("wb") as f:
-        shutil.copyfileobj(file, f)
-    return str(file_path)
+def blob_digest(url: str | None) -> str | None:
+    # Pictures uploaded before the blob store have plain file names.
+    if url and url.startswith(BLOB_URL_PREFIX):
+        digest = url.removeprefix(BLOB_URL_PREFIX)
+        if DIGEST.fullmatch(digest):
+            return digest
+    return None
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from pkg.database import load_urgent_requirements
+from pkg.serialization import get_adapter
+from pkg.storage import get_storage
+from pkg.utils import verify_password
+
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 4))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 5))
+
+
+async def warm_up(app: FastAPI):
+    db = app.state.db
+    started = time.perf_counter()
+    await db.warm_up(WARMUP_CONNECTIONS)
+    await load_urgent_requirements(db)
+    # Builds the storage client, so a misconfigured backend keeps the worker
+    # unready instead of failing the first upload.
+    get_storage()
+    # The first call picks passlib's bcrypt backend.
+    await run_in_threadpool(verify_password, "", None)
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.response_model is not None:
+            get_adapter(route.response_model)
+    app.state.ready = True
+    logging.info("Warmed up in %.2fs", time.perf_counter() - started)
+
+
+async def warm_up_until_ready(app: FastAPI):
+    while True:
+        try:
+            await warm_up(app)
+            return
+        except Exception:
+            logging.exception("Warmup failed, retrying")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
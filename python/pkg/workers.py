@@ -0,0 +1,72 @@
+import math
+import os
+
+# Connections one pod may open to each database server, shared by its
+# workers. Keep pods * DB_CONNECTION_BUDGET below the server's
+# max_connections (counting the extra pod of a rolling update).
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", 20))
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 20))
+
+# Workers share nothing but the database. Per-process state and how it
+# stays correct with several workers (and several pods):
+# - SSE subscriptions (EventHub): events are relayed between processes with
+#   Postgres LISTEN/NOTIFY, see PostgresEventRelay.
+# - Urgent requirement queue: rebuilt from the database when another
+#   process reports a requirement or fund change, and every
+#   URGENT_QUEUE_RELOAD_SECONDS.
+# - Dashboard read models, stat counters, reservations: stored in the
+#   database; the projector runs in the process that made the change.
+# - Login rate limit buckets: the shared database backend is the default
+#   with more than one worker; in-memory buckets would allow each worker
+#   the full rate.
+# - Read-your-writes window: kept per process and in a cookie, so the next
+#   request may land on any worker.
+# - User activity: buffered per process and written with timestamps that
+#   only move forward, so workers may flush in any order.
+# - Access tokens are stateless JWTs and the optimizer keeps no state.
+
+
+def cgroup_cpu_quota() -> float | None:
+    # CPUs allowed by a container CPU limit, from cgroup v2 or v1; None
+    # without a limit.
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    return int(quota) / int(period)
+
+
+def cpu_count() -> int:
+    # Honours CPU affinity and the CPU limit set by the container runtime.
+    if hasattr(os, "sched_getaffinity"):
+        count = len(os.sched_getaffinity(0))
+    else:
+        count = os.cpu_count() or 1
+    if (quota := cgroup_cpu_quota()) is not None:
+        count = min(count, math.ceil(quota))
+    return max(count, 1)
+
+
+def max_workers() -> int:
+    # Each worker needs a pool connection and one for the event relay.
+    return max(DB_CONNECTION_BUDGET // 2, 1)
+
+
+def worker_count() -> int:
+    # The entry point exports WEB_CONCURRENCY to its workers; a process
+    # started some other way (uvicorn directly, tests) is on its own.
+    return max(int(os.getenv("WEB_CONCURRENCY", 1)), 1)
+
+
+def worker_pool_size(workers: int) -> int:
+    # One connection per worker is kept for the event relay.
+    return max(DB_CONNECTION_BUDGET // workers - 1, 1)